@@ -0,0 +1,240 @@
+"""
+analysis.py
+-----------
+Streamlit-free NDA analysis pipeline.
+
+Text extraction, the NDA gate, clause splitting, risk detection, entities,
+the fairness score and document classification (doc_classifier.py),
+shared by the Streamlit UIs, the headless batch CLI (batch_cli.py) and
+the benchmarks.
+Nothing here imports streamlit or torch, and the document parsers (pypdf,
+python-docx) are only imported when a file of that type is read, so the
+module imports in milliseconds and runs fine in worker processes.
+
+    from analysis import ContractAnalyzer
+    report = ContractAnalyzer().analyze_path("nda.pdf")
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+# DOC_TYPES and classify_by_keywords are re-exported for the UIs
+from doc_classifier import DOC_TYPES, classify_by_keywords, classify_tiered
+from extraction import iter_pdf_pages, join_pages
+from incremental import clause_fingerprint
+from instrumentation import instrumented
+from nda_detector import NDA_KEYWORDS, NDA_SCAN_CHARS, NDA_SCAN_PAGES, NdaDetector, is_nda_text
+from risk_matcher import default_rules, get_default_matcher
+from segmentation import split_into_clauses as segment_clauses
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+# Bump when the analysis logic changes so stale cache entries are not reused
+ANALYSIS_CONFIG = {
+    "version": 5,
+    "nda_keywords": NDA_KEYWORDS,
+    "nda_scan": [NDA_SCAN_CHARS, NDA_SCAN_PAGES],
+    "risk_rules": default_rules(),
+}
+
+
+# -------------------------------------------------------------
+# ✅ Extract text from files
+# -------------------------------------------------------------
+@instrumented("extract_text")
+def extract_text(uploaded_file):
+    """
+    Text of a .txt / .pdf / .docx file. Anything with a `.name` and `.read()`
+    works: Streamlit uploads as well as files opened in binary mode.
+    """
+    name = uploaded_file.name.lower()
+
+    if name.endswith(".txt"):
+        return uploaded_file.read().decode("utf-8", errors="ignore")
+
+    elif name.endswith(".pdf"):
+        # Pages stream in order (page-parallel for long PDFs)
+        text, _ = join_pages(iter_pdf_pages(uploaded_file))
+        return text
+
+    elif name.endswith(".docx"):
+        import docx
+        doc = docx.Document(uploaded_file)
+        return "\n".join([p.text for p in doc.paragraphs])
+
+    return ""
+
+
+def read_document(file_obj):
+    """
+    Extract the document and run the NDA gate. PDF pages are checked as they
+    stream out, so a non-NDA is rejected after its first few pages.
+    Returns (text, is_nda); text is empty for an early rejection.
+    """
+    if not file_obj.name.lower().endswith(".pdf"):
+        text = extract_text(file_obj)
+        return text, is_nda_text(text)
+
+    detector = NdaDetector()
+    pages = []
+    page_iter = iter_pdf_pages(file_obj)
+    for page in page_iter:
+        pages.append(page)
+        if detector.feed_page(page.text) is False:
+            page_iter.close()
+            return "", False
+
+    text, _ = join_pages(pages)
+    return text, detector.finish()
+
+
+# -------------------------------------------------------------
+# ✅ Clause splitting (single pass, see segmentation.py)
+# -------------------------------------------------------------
+@instrumented("split_into_clauses")
+def split_into_clauses(text):
+    return segment_clauses(text, min_len=41)
+
+
+# -------------------------------------------------------------
+# ⚠️ Risks, fairness and entities
+# -------------------------------------------------------------
+@instrumented("risk_matching")
+def detect_risks(clauses):
+    # One Aho-Corasick pass over all clauses (RISK_PATTERNS + legal_kb.json risks)
+    return get_default_matcher().labels_for_clauses(clauses, limit=5)  # top 5
+
+
+@instrumented("risk_matching")
+def clause_risk_labels(clauses):
+    """Risk labels of each clause on its own (rule order), from one scan."""
+    matcher = get_default_matcher()
+    order = {label: i for i, label in enumerate(matcher.labels)}
+    return [sorted({h.label for h in hits}, key=order.get) for hits in matcher.scan_clauses(clauses)]
+
+
+def merge_risk_labels(per_clause, limit=5):
+    """Same result as detect_risks, from per-clause labels."""
+    found = {}
+    for labels in per_clause:
+        for label in labels:
+            found.setdefault(label, None)
+    return list(found)[:limit]
+
+
+def compute_fairness(risks_found):
+    return max(20, min(90, 50 - len(risks_found) * 7))
+
+
+def clause_entities(clause):
+    return {
+        "parties": [clause[:80] + "..."] if "party" in clause.lower() else [],
+        "dates": re.findall(r"\b(?:\d{1,2}\/\d{1,2}\/\d{2,4}|20\d{2})\b", clause),
+        "money": re.findall(r"\$[\d,]+", clause),
+    }
+
+
+def merge_entities(per_clause):
+    return {
+        key: sorted({value for ents in per_clause for value in ents[key]})
+        for key in ("parties", "dates", "money")
+    }
+
+
+def extract_entities(clauses):
+    return merge_entities([clause_entities(c) for c in clauses])
+
+
+# -------------------------------------------------------------
+# 🚀 Pipeline
+# -------------------------------------------------------------
+def analyze_text(text, store=None):
+    """
+    With a ClauseResultStore, per-clause risks and entities of clauses seen
+    before (e.g. in the previous version of this NDA) are reused and only
+    new or edited clauses are scanned.
+    """
+    clauses = split_into_clauses(text)
+    if store is None:
+        clause_risks = clause_risk_labels(clauses)
+        clause_ents = [clause_entities(c) for c in clauses]
+    else:
+        clause_risks = store.map("risks", clauses, clause_risk_labels, ANALYSIS_CONFIG)
+        clause_ents = store.map("entities", clauses, lambda cs: [clause_entities(c) for c in cs], ANALYSIS_CONFIG)
+
+    risks_found = merge_risk_labels(clause_risks)
+    return {
+        "clauses": clauses,
+        "fingerprints": [clause_fingerprint(c) for c in clauses],
+        "risks": risks_found,
+        "entities": merge_entities(clause_ents),
+        "fairness": compute_fairness(risks_found),
+    }
+
+
+@instrumented("analyze_document")
+def analyze_document(file_obj, store=None):
+    """Full pipeline for one file: text, NDA gate and (for NDAs) the analysis."""
+    text, is_nda = read_document(file_obj)
+    if not is_nda:
+        return {"text": text, "is_nda": False}
+    return {"text": text, "is_nda": True, **analyze_text(text, store)}
+
+
+class ContractAnalyzer:
+    """
+    Reusable entry point for the analysis pipeline.
+
+    Pass a loaded spaCy pipeline as `nlp` to add model-based entities under
+    the "ner" key. Pass an incremental.ClauseResultStore as `store` to reuse
+    per-clause results across revisions of a document. Without a store the
+    instance holds no locks or open handles, so it can be pickled into a
+    process pool.
+    """
+
+    def __init__(self, nlp=None, ner_processes: Optional[int] = 1, store=None):
+        self.nlp = nlp
+        self.ner_processes = ner_processes
+        self.store = store
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return ANALYSIS_CONFIG
+
+    def analyze_text(self, text: str, check_nda: bool = True) -> Dict[str, Any]:
+        is_nda = is_nda_text(text) if check_nda else True
+        return self._report(text, is_nda)
+
+    def analyze_file(self, file_obj) -> Dict[str, Any]:
+        """`file_obj` needs a `.name` (for the extension) and `.read()`."""
+        text, is_nda = read_document(file_obj)
+        return self._report(text, is_nda)
+
+    def analyze_path(self, path: str) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            return self.analyze_file(f)
+
+    def classify(self, text: str) -> str:
+        # No LLM here: low-margin documents get the keyword model's best guess
+        return classify_tiered(text).doc_type
+
+    def _report(self, text: str, is_nda: bool) -> Dict[str, Any]:
+        report = {"text": text, "is_nda": is_nda}
+        if not is_nda:
+            return report
+        report.update(analyze_text(text, self.store))
+        report["doc_type"] = self.classify(text)
+        if self.nlp is not None:
+            report["ner"] = self._ner(text)
+        return report
+
+    def _ner(self, text: str) -> Dict[str, Any]:
+        from ner import entities_per_text, extract_entities as ner_extract, group_entities, ner_pieces
+        if self.store is None:
+            return group_entities(ner_extract(self.nlp, text, n_process=self.ner_processes))
+        per_clause = self.store.map(
+            "ner", ner_pieces(text),
+            lambda cs: entities_per_text(self.nlp, cs, n_process=self.ner_processes),
+            {"model": self.nlp.meta.get("name"), "version": self.nlp.meta.get("version")},
+        )
+        return group_entities([ent for ents in per_clause for ent in ents])
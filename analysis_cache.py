@@ -0,0 +1,129 @@
+"""
+analysis_cache.py
+-----------------
+Content-addressed cache for ClauseWise document analysis.
+
+Results are keyed by a SHA-256 of the uploaded bytes plus the analysis
+config, so Streamlit reruns and re-uploads of the same file skip text
+extraction, clause splitting, risk detection, entities and fairness.
+A bounded in-memory LRU sits in front of an optional on-disk tier.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+# -------------------------------------------------------------------
+# 🔑 Cache keys
+# -------------------------------------------------------------------
+def document_key(data: bytes, config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    SHA-256 of the document bytes followed by the canonical JSON of the config.
+    Changing any analysis setting (patterns, keywords, version) gives a new key.
+    """
+    h = hashlib.sha256()
+    h.update(data)
+    h.update(b"\0")
+    h.update(json.dumps(config or {}, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+# -------------------------------------------------------------------
+# 🗄️ Two-tier cache
+# -------------------------------------------------------------------
+class AnalysisCache:
+    """
+    Bounded LRU of analysis results with an optional pickle-per-key disk tier.
+    Safe to share between Streamlit sessions (all access is under one lock).
+    """
+
+    def __init__(self, max_entries: int = 32, disk_dir: Optional[str] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Corrupt or incompatible entry: treat as a miss
+            return None
+
+    def _write_disk(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.disk_dir:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._disk_path(key))
+        except Exception:
+            pass
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
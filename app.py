@@ -1,39 +1,10 @@
-import re
-from pypdf import PdfReader
-import docx
 import io
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
+from generation import TokenStream
 
-# -------------------------------------------------------------
-# ✅ Extract text from files
-# -------------------------------------------------------------
-def extract_text(uploaded_file):
-    name = uploaded_file.name.lower()
-
-    if name.endswith(".txt"):
-        return uploaded_file.read().decode("utf-8", errors="ignore")
-
-    elif name.endswith(".pdf"):
-        reader = PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
-
-    elif name.endswith(".docx"):
-        doc = docx.Document(uploaded_file)
-        return "\n".join([p.text for p in doc.paragraphs])
-
-    return ""
-
-# -------------------------------------------------------------
-# ✅ Clause splitting (very stable)
-# -------------------------------------------------------------
-def split_into_clauses(text):
-    parts = re.split(r"\n\s*\d+\.\s+|\n\s*-\s+|\n{2,}", text)
-    clauses = [p.strip() for p in parts if len(p.strip()) > 40]
-    return clauses[:15]  # keep app fast for HF cpu
+# Text extraction and clause splitting live in the Streamlit-free analysis module
+from analysis import extract_text, split_into_clauses
 
 # -------------------------------------------------------------
 # ✅ Clause simplifier (dummy logic)
@@ -55,7 +26,12 @@ def simplify_clause(clause, mode):
 # -------------------------------------------------------------
 # ✅ Chat with DistilGPT2 (working HF CPU-safe chat)
 # -------------------------------------------------------------
-def chat_with_model(model, tokenizer, prompt, history):
+# Stop as soon as the model starts writing the next turn itself
+CHAT_STOP_SEQUENCES = ["\nUser:", "\nAI:"]
+CHAT_MAX_NEW_TOKENS = 120
+
+
+def build_chat_context(prompt, history):
     full_prompt = ""
 
     # Build few-shot conversation context (last 6 messages)
@@ -63,22 +39,31 @@ def chat_with_model(model, tokenizer, prompt, history):
         full_prompt += f"{role}: {text}\n"
 
     full_prompt += f"User: {prompt}\nAI:"
-
-    inputs = tokenizer(full_prompt, return_tensors="pt")
-
-    with torch.no_grad():
-        output = model.generate(
-            **inputs,
-            max_length=200,
-            num_beams=1,
-            no_repeat_ngram_size=2,
-            pad_token_id=tokenizer.eos_token_id
-        )
-
-    result = tokenizer.decode(output[0], skip_special_tokens=True)
-
-    # Clean only last assistant message
-    if "AI:" in result:
-        result = result.split("AI:")[-1].strip()
-
-    return result
+    return full_prompt
+
+
+def stream_chat_with_model(model, tokenizer, prompt, history, session=None, lock=None):
+    """
+    Yield the assistant reply piece by piece as tokens are generated.
+    With a ChatSession, the KV cache of the previous turns is reused so only
+    the new part of the conversation is encoded. `lock` serializes the
+    generate call with other users of the model (InferenceWorker.model_lock).
+    """
+    gen_kwargs = dict(
+        max_new_tokens=CHAT_MAX_NEW_TOKENS,
+        stop=CHAT_STOP_SEQUENCES,
+        lock=lock,
+        num_beams=1,
+        no_repeat_ngram_size=2,
+        pad_token_id=tokenizer.eos_token_id
+    )
+    full_prompt = build_chat_context(prompt, history)
+
+    if session is not None:
+        yield from session.stream_reply(model, tokenizer, full_prompt, **gen_kwargs)
+    else:
+        yield from TokenStream(model, tokenizer, full_prompt, **gen_kwargs)
+
+
+def chat_with_model(model, tokenizer, prompt, history, session=None, lock=None):
+    return "".join(stream_chat_with_model(model, tokenizer, prompt, history, session, lock)).strip()
@@ -3,11 +3,24 @@ backup_features.py
 -------------------
 Supplementary AI utility functions for ClauseWise Legal AI Assistant.
 These can be imported into app.py for future feature upgrades.
+
+The analysis helpers are plain Python; streamlit is only imported by the
+functions that render UI, so batch jobs can import this module cheaply.
 """
 
-import streamlit as st
 import re
 import random
+from comparison import compare_contracts
+from risk_matcher import RiskMatcher
+
+# Keywords that make a sentence worth a second look
+RISKY_TERMS = {
+    "Penalty": ["penalty"],
+    "Termination": ["termination"],
+    "Sole / exclusive rights": ["sole", "exclusive"],
+    "Arbitration": ["arbitration"],
+}
+_risky_terms_matcher = RiskMatcher(RISKY_TERMS)
 
 # -------------------------------------------------------------------
 # 🧠 Named Entity Recognition
@@ -54,8 +67,9 @@ def flag_risky_clauses(text):
     """
     risky = []
     clauses = re.split(r"\n|\. ", text)
-    for clause in clauses:
-        if re.search(r"penalty|termination|sole|exclusive|arbitration", clause, re.I):
+    # One pass over all sentences instead of a regex search per sentence
+    for clause, hits in zip(clauses, _risky_terms_matcher.scan_clauses(clauses)):
+        if hits:
             risky.append(f"⚠️ Risky Clause Detected: {clause.strip()}")
     return risky or ["No high-risk clauses detected."]
 
@@ -67,6 +81,7 @@ def timeline_visualization(text):
     Generate a timeline of key events from the contract.
     To be replaced later with Plotly timeline chart.
     """
+    import streamlit as st
     st.info("📅 Timeline visualization placeholder (to be implemented with Plotly or Streamlit chart).")
 
 # -------------------------------------------------------------------
@@ -109,14 +124,21 @@ def ai_contract_assistant(text):
 # -------------------------------------------------------------------
 def contract_comparison(text1, text2):
     """
-    Compare two contracts and identify key differences.
+    Compare two contracts clause by clause (see comparison.py) and summarise
+    the added, removed and modified clauses and the change in risks.
+    Use comparison.compare_contracts for the full report.
     """
-    if len(text1) > len(text2):
-        return "Contract A has more extensive clauses; Contract B is more concise."
-    elif len(text1) < len(text2):
-        return "Contract B includes additional terms; Contract A is shorter."
-    else:
-        return "Both contracts are similar in length and complexity."
+    report = compare_contracts(text1, text2)
+    lines = [report.summary()]
+    for change in report.modified[:5]:
+        label = change.new.number or f"clause {change.new.index + 1}"
+        edits = "; ".join(
+            f"'{old}' -> '{new}'" if op == "replace" else (f"+'{new}'" if op == "insert" else f"-'{old}'")
+            for op, old, new in change.edits[:3]
+        )
+        risk = f" [new risk: {', '.join(change.risks_added)}]" if change.risks_added else ""
+        lines.append(f"~ {label}: {edits}{risk}")
+    return "\n".join(lines)
 
 # -------------------------------------------------------------------
 # 🌐 Multilingual Support Placeholder
@@ -134,6 +156,7 @@ def text_to_audio(text):
     """
     Placeholder for text-to-speech (implemented in app.py).
     """
+    import streamlit as st
     st.info("🔊 Text-to-audio placeholder. Add TTS module (gTTS/pyttsx3) to enable.")
 
 # -------------------------------------------------------------------
@@ -143,6 +166,7 @@ def demo_all_features(sample_text):
     """
     Run all backup modules on sample text for testing.
     """
+    import streamlit as st
     st.subheader("🔍 Named Entities")
     st.json(named_entity_recognition(sample_text))
 
@@ -0,0 +1,250 @@
+"""
+batch_cli.py
+------------
+Headless batch analysis of a folder of contracts.
+
+Walks a directory for .pdf / .docx / .txt files and runs the same pipeline
+as the Streamlit UI (extraction, NDA detection, clause splitting, risks,
+entities, fairness) across a process pool. One JSON line per file is
+appended to the output as soon as that file finishes, so an interrupted run
+resumes where it stopped. Files that failed, and files analyzed under a
+different analysis config, are done again on resume (the newest line for a
+path wins).
+
+    python batch_cli.py contracts/ --out results.jsonl
+    python batch_cli.py contracts/ --out results.jsonl --workers 8 --ner
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+import analysis
+import extraction
+
+_analyzer = None
+
+
+def iter_contracts(root: str) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(analysis.SUPPORTED_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def file_key(path: str) -> Tuple[str, int, int]:
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def config_digest(include_clauses: bool = False, use_ner: bool = False) -> str:
+    """Identifies the analysis a record came from (ANALYSIS_CONFIG and the record options)."""
+    blob = json.dumps({"analysis": analysis.ANALYSIS_CONFIG, "clauses": include_clauses, "ner": use_ner},
+                      sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def load_done(out_path: str, config: str) -> Set[Tuple[str, int, int]]:
+    """
+    Files already analyzed successfully under `config`. Errors are retried.
+    A torn last line from a crash is ignored.
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            key = (rec["path"], rec["size"], rec["mtime_ns"])
+            if "error" in rec or rec.get("config") != config:
+                done.discard(key)
+            else:
+                done.add(key)
+    return done
+
+
+# -------------------------------------------------------------------
+# 🧵 Worker process
+# -------------------------------------------------------------------
+def _init_worker(use_ner: bool) -> None:
+    global _analyzer
+    # Parallelism comes from the file pool; no nested PDF page pools
+    extraction.PDF_WORKERS = 1
+    nlp = None
+    if use_ner:
+        import spacy
+        nlp = spacy.load("en_core_web_sm")
+    _analyzer = analysis.ContractAnalyzer(nlp=nlp)
+
+
+def _new_record(path: str, config: str) -> Dict:
+    return {"path": os.path.abspath(path), "size": 0, "mtime_ns": 0, "config": config}
+
+
+def _stat_record(record: Dict, path: str) -> Dict:
+    _, record["size"], record["mtime_ns"] = file_key(path)
+    return record
+
+
+def _is_done(path: str, done: set) -> bool:
+    try:
+        return file_key(path) in done
+    except OSError:
+        # Gone since the folder was listed: analyze_path writes its error record
+        return False
+
+
+def analyze_path(path: str, include_clauses: bool = False, config: str = "") -> Dict:
+    record = _new_record(path, config)
+    start = time.perf_counter()
+    try:
+        _stat_record(record, path)
+        result = (_analyzer or analysis.ContractAnalyzer()).analyze_path(path)
+        record["is_nda"] = result["is_nda"]
+        record["chars"] = len(result["text"])
+        if result["is_nda"]:
+            record["n_clauses"] = len(result["clauses"])
+            record["risks"] = result["risks"]
+            record["entities"] = result["entities"]
+            record["fairness"] = result["fairness"]
+            record["doc_type"] = result["doc_type"]
+            if "ner" in result:
+                record["ner"] = result["ner"]
+            if include_clauses:
+                record["clauses"] = result["clauses"]
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+# -------------------------------------------------------------------
+# 🚀 Driver
+# -------------------------------------------------------------------
+def _new_pool(workers: Optional[int], use_ner: bool) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(use_ner,))
+
+
+def run(root: str, out_path: str, workers: Optional[int] = None, resume: bool = True,
+        include_clauses: bool = False, use_ner: bool = False) -> Dict:
+    config = config_digest(include_clauses, use_ner)
+    done = load_done(out_path, config) if resume else set()
+    found = list(iter_contracts(root))
+    todo = [p for p in found if not _is_done(p, done)]
+    skipped = len(found) - len(todo)
+
+    stats = {"processed": 0, "skipped": skipped, "nda": 0, "errors": 0, "bytes": 0, "pool_restarts": 0}
+    start = time.perf_counter()
+    mode = "a" if resume else "w"
+    # Bounded in-flight set: memory stays flat for folders of any size
+    max_in_flight = (workers or os.cpu_count() or 1) * 4
+
+    def write(rec: Dict) -> None:
+        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        out.flush()
+        stats["processed"] += 1
+        stats["bytes"] += rec["size"]
+        stats["nda"] += 1 if rec.get("is_nda") else 0
+        stats["errors"] += 1 if "error" in rec else 0
+
+    with open(out_path, mode, encoding="utf-8") as out:
+        pool = _new_pool(workers, use_ner)
+        pending: Dict = {}          # future -> path
+        isolated = set()            # futures running alone, so a crash is theirs
+        suspects = []               # in flight when a worker died; retried one at a time
+        paths = iter(todo)
+        try:
+            while True:
+                if suspects:
+                    if not pending:
+                        fut = pool.submit(analyze_path, suspects[0], include_clauses, config)
+                        pending[fut] = suspects.pop(0)
+                        isolated.add(fut)
+                else:
+                    for path in paths:
+                        pending[pool.submit(analyze_path, path, include_clauses, config)] = path
+                        if len(pending) >= max_in_flight:
+                            break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                broken = False
+                for fut in finished:
+                    path = pending.pop(fut)
+                    try:
+                        write(fut.result())
+                    except BrokenProcessPool:
+                        # A worker died (out of memory, segfault in a PDF parser, ...)
+                        broken = True
+                        if fut in isolated:
+                            rec = _new_record(path, config)
+                            try:
+                                _stat_record(rec, path)
+                            except OSError:
+                                pass
+                            write({**rec, "seconds": 0.0,
+                                   "error": "BrokenProcessPool: worker process died while analyzing this file"})
+                        else:
+                            suspects.append(path)
+                    isolated.discard(fut)
+                if broken:
+                    suspects.extend(pending.values())
+                    pending.clear()
+                    isolated.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = _new_pool(workers, use_ner)
+                    stats["pool_restarts"] += 1
+        except KeyboardInterrupt:
+            for fut in pending:
+                fut.cancel()
+            stats["interrupted"] = True
+        finally:
+            pool.shutdown(wait=not stats.get("interrupted"), cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["files_per_sec"] = round(stats["processed"] / elapsed, 2) if elapsed > 0 else 0.0
+    stats["mb_per_sec"] = round(stats["bytes"] / 1e6 / elapsed, 2) if elapsed > 0 else 0.0
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-analyze a folder of NDAs (PDF/DOCX/TXT) into JSONL.")
+    parser.add_argument("root", help="directory to scan recursively")
+    parser.add_argument("--out", default="clausewise_results.jsonl", help="JSONL output (appended to on resume)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming")
+    parser.add_argument("--clauses", action="store_true", help="include the clause texts in each record")
+    parser.add_argument("--ner", action="store_true", help="also run spaCy NER (en_core_web_sm)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        parser.error(f"not a directory: {args.root}")
+
+    stats = run(args.root, args.out, workers=args.workers, resume=not args.no_resume,
+                include_clauses=args.clauses, use_ner=args.ner)
+
+    print(
+        f"{stats['processed']} files analyzed ({stats['skipped']} already done), "
+        f"{stats['nda']} NDAs, {stats['errors']} errors in {stats['seconds']}s "
+        f"— {stats['files_per_sec']} files/s, {stats['mb_per_sec']} MB/s",
+        file=sys.stderr,
+    )
+    if stats.get("interrupted"):
+        print("Interrupted: re-run the same command to resume.", file=sys.stderr)
+        return 130
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+bench_assisted.py
+-----------------
+Compare plain greedy decoding of the Granite model with assisted
+generation, where a small draft model with the same tokenizer (Granite 3.1
+1B-A400M by default) proposes tokens and Granite verifies them.
+
+Each mode runs in its own subprocess, like bench_quantization.py. Every
+clause of the sample NDAs is simplified with the app's prompt, and we record
+time to first token, decode tokens/sec and, in assisted mode, the share of
+drafted tokens Granite accepted (counted by the candidate generator).
+Greedy assisted decoding should reproduce the baseline text;
+`same_output_pct` checks that.
+
+    python benchmarks/bench_assisted.py
+    python benchmarks/bench_assisted.py --draft-tokens 5 --quant int8 --out assisted.json
+    python benchmarks/bench_assisted.py --draft distilgpt2 --allow-universal
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from bench_quantization import DEFAULT_MODEL, current_rss_mb, load_clauses, peak_rss_mb
+
+DEFAULT_DRAFT = "ibm-granite/granite-3.1-1b-a400m-instruct"
+
+
+def run_mode(args) -> dict:
+    from generation import TokenStream, assisted_kwargs, count_acceptance, draft_context_fits, tokenizers_compatible
+    from model_loader import load_causal_lm
+    from prompts import SIMPLIFY_SYSTEM_PROMPT, build_simplify_prompt, chat_prompt
+
+    start = time.perf_counter()
+    tokenizer, model = load_causal_lm(args.model, device="cpu", quant=args.quant, num_threads=args.threads)
+    draft_tokenizer = draft_model = None
+    if args.mode == "assisted":
+        draft_tokenizer, draft_model = load_causal_lm(args.draft, device="cpu", quant=args.quant,
+                                                      num_threads=args.threads)
+    load_s = time.perf_counter() - start
+    rss_after_load = current_rss_mb()
+
+    ttfts, rates, outputs, tokens, skipped = [], [], [], 0, 0
+    with count_acceptance(model) as acceptance:
+        for clause in load_clauses(args.corpus)[:args.max_clauses]:
+            prompt = chat_prompt(tokenizer, SIMPLIFY_SYSTEM_PROMPT, build_simplify_prompt(clause))
+            assist = {}
+            if draft_model is not None:
+                if not draft_context_fits(draft_model, draft_tokenizer, prompt, args.max_new_tokens):
+                    skipped += 1
+                    continue
+                assist = assisted_kwargs(tokenizer, draft_model, draft_tokenizer, args.draft_tokens or None,
+                                         allow_universal=args.allow_universal)
+
+            # The app's greedy decoding (CLAUSEWISE_LLM_DETERMINISTIC=1)
+            stream = TokenStream(model, tokenizer, prompt, max_new_tokens=args.max_new_tokens, do_sample=False,
+                                 repetition_penalty=1.1, pad_token_id=tokenizer.eos_token_id, **assist)
+            outputs.append("".join(stream))
+            ttfts.append(stream.ttft or 0.0)
+            rates.append(stream.tokens_per_sec)
+            tokens += stream.token_count
+
+    return {
+        "mode": args.mode,
+        "draft": args.draft if draft_model is not None else None,
+        "shared_vocab": tokenizers_compatible(tokenizer, draft_tokenizer) if draft_model is not None else None,
+        "quant": args.quant,
+        "threads": args.threads or os.cpu_count(),
+        "load_s": round(load_s, 2),
+        "rss_after_load_mb": round(rss_after_load, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "clauses": len(ttfts),
+        "skipped_too_long": skipped,
+        "new_tokens": tokens,
+        "ttft_median_s": round(statistics.median(ttfts), 3) if ttfts else None,
+        "tokens_per_sec_median": round(statistics.median(rates), 2) if rates else None,
+        "verify_steps": acceptance.steps if draft_model is not None else None,
+        "proposed_tokens": acceptance.proposed if draft_model is not None else None,
+        "acceptance_rate": round(acceptance.rate, 3) if draft_model is not None else None,
+        "outputs": outputs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--draft", default=DEFAULT_DRAFT)
+    parser.add_argument("--draft-tokens", type=int, default=0, help="tokens drafted per step (0 = adaptive)")
+    parser.add_argument("--allow-universal", action="store_true",
+                        help="allow a draft with a different tokenizer (universal assisted decoding)")
+    parser.add_argument("--modes", nargs="+", default=["baseline", "assisted"])
+    parser.add_argument("--mode", help=argparse.SUPPRESS)   # set in the child process
+    parser.add_argument("--quant", default="fp32", help="CPU mode of the target model: fp32 or int8")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--corpus", default="assets/*.txt", help="glob (relative to the repo) of sample NDAs")
+    parser.add_argument("--max-clauses", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    results = []
+    for mode in args.modes:
+        cmd = [sys.executable, __file__, "--mode", mode, "--model", args.model, "--draft", args.draft,
+               "--draft-tokens", str(args.draft_tokens), "--quant", args.quant, "--threads", str(args.threads),
+               "--corpus", args.corpus, "--max-clauses", str(args.max_clauses),
+               "--max-new-tokens", str(args.max_new_tokens)]
+        if args.allow_universal:
+            cmd.append("--allow-universal")
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    # Greedy assisted decoding is lossless: its text should match the baseline clause for clause
+    baseline = next((r["outputs"] for r in results if r["mode"] == "baseline"), None)
+    for r in results:
+        if baseline is not None and r["mode"] != "baseline" and not r["skipped_too_long"]:
+            same = sum(a == b for a, b in zip(r["outputs"], baseline))
+            r["same_output_pct"] = round(100.0 * same / max(len(baseline), 1), 1)
+
+    cols = ["mode", "load_s", "rss_after_load_mb", "ttft_median_s", "tokens_per_sec_median",
+            "acceptance_rate", "same_output_pct"]
+    print(" | ".join(f"{c:>22}" for c in cols))
+    for r in results:
+        print(" | ".join(f"{str(r.get(c)):>22}" for c in cols))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+bench_pipeline.py
+-----------------
+End-to-end benchmark of the ClauseWise analysis pipeline.
+
+Runs every stage over a synthetic NDA corpus (benchmarks/corpus.py: the
+assets sample plus generated 1/10/100/500-page contracts) and reports
+latency percentiles, throughput and peak RSS per stage. Each stage runs in
+its own subprocess so its peak RSS is not inflated by the stages before it.
+
+CPU stages run by default. The model stages (simplify_clause_fast,
+chat_with_model, classify_document_llm) download and run the real models
+and are only run with --llm.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --pages 1 10 --repeats 3 --save benchmarks/baselines/pipeline.json
+    python benchmarks/bench_pipeline.py --compare benchmarks/baselines/pipeline.json --tolerance 0.25
+    python benchmarks/bench_pipeline.py --llm --stages simplify_clause_fast chat_with_model
+    python benchmarks/bench_pipeline.py --llm --stages simplify_clause_fast --prefix-cache
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import DEFAULT_PAGES, build_corpus  # noqa: E402
+from prompts import (CLASSIFY_SYSTEM_PROMPT, SIMPLIFY_SYSTEM_PROMPT, build_classify_prompt,  # noqa: E402
+                     build_simplify_prompt, chat_prompt)
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines", "pipeline.json")
+GRANITE_MODEL = "ibm-granite/granite-3.2-2b-instruct"
+CHAT_MODEL = "distilgpt2"
+
+CHAT_QUESTIONS = [
+    "What is confidential information?",
+    "How long does the agreement last?",
+    "Can the agreement be terminated early?",
+    "What happens if I breach the agreement?",
+]
+
+CPU_STAGES = ["extract_text", "split_into_clauses", "risk_matching", "ner", "classify_document", "end_to_end"]
+LLM_STAGES = ["simplify_clause_fast", "chat_with_model", "classify_document_llm"]
+
+# Model stages only run on the small documents: their cost is per clause/question
+LLM_DOCS = ["sample", "1p"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def summarize(samples: List[Tuple[float, int]], unit: str) -> Dict:
+    secs = [s for s, _ in samples]
+    total_s = sum(secs)
+    units = sum(u for _, u in samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(percentile(secs, 50) * 1000, 3),
+        "p90_ms": round(percentile(secs, 90) * 1000, 3),
+        "p99_ms": round(percentile(secs, 99) * 1000, 3),
+        "mean_ms": round(total_s / len(secs) * 1000, 3) if secs else 0.0,
+        "unit": unit,
+        "throughput_per_s": round(units / total_s, 1) if total_s > 0 else None,
+    }
+
+
+def _timed(fn: Callable[[], int]) -> Tuple[float, int]:
+    start = time.perf_counter()
+    units = fn()
+    return time.perf_counter() - start, units
+
+
+def _repeat(fn: Callable[[], int], repeats: int) -> List[Tuple[float, int]]:
+    fn()  # warm-up: imports, matcher/automaton construction, page caches
+    return [_timed(fn) for _ in range(repeats)]
+
+
+def _pdf_file(doc: Dict):
+    f = io.BytesIO(doc["pdf"])
+    f.name = "bench.pdf"
+    return f
+
+
+# -------------------------------------------------------------------
+# ⏱️ Stages
+# Each returns (samples, unit) for one document; a sample is (seconds, units).
+# -------------------------------------------------------------------
+def stage_extract_text(doc, ctx, args):
+    from analysis import extract_text
+    return _repeat(lambda: len(extract_text(_pdf_file(doc))), args.repeats), "chars"
+
+
+def stage_split_into_clauses(doc, ctx, args):
+    from analysis import split_into_clauses
+    text = doc["text"]
+
+    def run():
+        split_into_clauses(text)
+        return len(text)
+    return _repeat(run, args.repeats), "chars"
+
+
+def stage_risk_matching(doc, ctx, args):
+    from risk_matcher import get_default_matcher
+    matcher = get_default_matcher()
+    text = doc["text"]
+
+    def run():
+        matcher.scan(text)
+        return len(text)
+    return _repeat(run, args.repeats), "chars"
+
+
+def stage_ner(doc, ctx, args):
+    # What app.py.py's ner_entities computes for a new document (no stored results)
+    from ner import entities_per_text, ner_pieces
+    if "nlp" not in ctx:
+        import spacy
+        ctx["nlp"] = spacy.load("en_core_web_sm")
+    text = doc["text"]
+
+    def run():
+        entities_per_text(ctx["nlp"], ner_pieces(text))
+        return len(text)
+    return _repeat(run, max(1, args.repeats // 2)), "chars"
+
+
+def stage_classify_document(doc, ctx, args):
+    from doc_classifier import classify_tiered
+    text = doc["text"]
+
+    def run():
+        classify_tiered(text, stats=None)   # keyword tier only; the LLM tier is classify_document_llm
+        return len(text)
+    return _repeat(run, args.repeats), "chars"
+
+
+def stage_end_to_end(doc, ctx, args):
+    from analysis import ContractAnalyzer
+    analyzer = ContractAnalyzer()
+
+    def run():
+        analyzer.analyze_file(_pdf_file(doc))
+        return len(doc["pdf"])
+    return _repeat(run, args.repeats), "bytes"
+
+
+def _granite(ctx, args):
+    if "granite" not in ctx:
+        from model_loader import load_causal_lm
+        ctx["granite"] = load_causal_lm(args.model, device="cpu")
+    return ctx["granite"]
+
+
+def _stream_tokens(tokenizer, model, system_prompt: str, user_prompt: str, max_new_tokens: int,
+                   prefix_cache=None, prefix=None) -> int:
+    from generation import TokenStream
+    prompt = chat_prompt(tokenizer, system_prompt, user_prompt)
+    gen_kwargs = {}
+    if prefix_cache is not None:
+        past, _ = prefix_cache.past_for(tokenizer(prompt)["input_ids"], prefix)
+        if past is not None:
+            gen_kwargs["past_key_values"] = past
+    # The app's greedy decoding (CLAUSEWISE_LLM_DETERMINISTIC=1)
+    stream = TokenStream(model, tokenizer, prompt, max_new_tokens=max_new_tokens, do_sample=False,
+                         repetition_penalty=1.1, pad_token_id=tokenizer.eos_token_id, **gen_kwargs)
+    for _ in stream:
+        pass
+    return stream.token_count
+
+
+def stage_simplify_clause_fast(doc, ctx, args):
+    from analysis import split_into_clauses
+    tokenizer, model = _granite(ctx, args)
+    clauses = split_into_clauses(doc["text"])[:args.max_clauses] or [doc["text"]]
+
+    prefix_cache = prefix = None
+    if args.prefix_cache:
+        from generation import PrefixKVCache, constant_prefix
+        prefix_cache = PrefixKVCache(model, tokenizer)
+        prefix = constant_prefix(lambda c: chat_prompt(tokenizer, SIMPLIFY_SYSTEM_PROMPT, build_simplify_prompt(c)))
+        prefix_cache.past_for(tokenizer(prefix + "x")["input_ids"], prefix)  # built once per process, not per clause
+    samples = [
+        _timed(lambda c=c: _stream_tokens(tokenizer, model, SIMPLIFY_SYSTEM_PROMPT, build_simplify_prompt(c),
+                                          args.max_new_tokens, prefix_cache, prefix))
+        for c in clauses
+    ]
+    return samples, "tokens"
+
+
+def stage_classify_document_llm(doc, ctx, args):
+    from analysis import DOC_TYPES
+    tokenizer, model = _granite(ctx, args)
+    from generation import score_labels
+    prompt = chat_prompt(tokenizer, CLASSIFY_SYSTEM_PROMPT, build_classify_prompt(doc["text"]))
+
+    def run():
+        score_labels(model, tokenizer, prompt, DOC_TYPES)
+        return len(DOC_TYPES)
+    return [_timed(run) for _ in range(max(1, args.repeats // 2))], "labels"
+
+
+def stage_chat_with_model(doc, ctx, args):
+    from app import chat_with_model
+    if "chat" not in ctx:
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(CHAT_MODEL)
+        tokenizer.pad_token = tokenizer.eos_token
+        ctx["chat"] = (AutoModelForCausalLM.from_pretrained(CHAT_MODEL), tokenizer)
+    model, tokenizer = ctx["chat"]
+
+    samples, history = [], []
+    for q in CHAT_QUESTIONS:
+        reply = ""
+
+        def run(q=q):
+            nonlocal reply
+            reply = chat_with_model(model, tokenizer, q, history)
+            return len(tokenizer.encode(reply))
+        samples.append(_timed(run))
+        history += [("User", q), ("AI", reply)]
+    return samples, "tokens"
+
+
+STAGES = {name: globals()[f"stage_{name}"] for name in CPU_STAGES + LLM_STAGES}
+
+
+# -------------------------------------------------------------------
+# 🚀 Runner
+# -------------------------------------------------------------------
+def run_stage(args) -> Dict:
+    """Child process: one stage over the whole corpus."""
+    corpus = build_corpus(args.pages, seed=args.seed)
+    rss_before = peak_rss_mb()
+    docs = LLM_DOCS if args.stage in LLM_STAGES else list(corpus)
+    fn, ctx = STAGES[args.stage], {}
+
+    result = {"stage": args.stage, "docs": {}}
+    try:
+        for name in docs:
+            if name not in corpus:
+                continue
+            samples, unit = fn(corpus[name], ctx, args)
+            result["docs"][name] = {"chars": len(corpus[name]["text"]), **summarize(samples, unit)}
+    except (ImportError, OSError) as e:
+        # Optional dependency or model not installed here
+        result["skipped"] = f"{type(e).__name__}: {e}"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["rss_before_mb"] = round(rss_before, 1)
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, floor_ms: float) -> List[str]:
+    """p50 regressions beyond `tolerance` (fraction) and an absolute noise floor."""
+    old = {s["stage"]: s for s in baseline.get("stages", [])}
+    regressions = []
+    for stage in current["stages"]:
+        before = old.get(stage["stage"], {}).get("docs", {})
+        for doc, now in stage.get("docs", {}).items():
+            if doc not in before:
+                continue
+            was, new = before[doc]["p50_ms"], now["p50_ms"]
+            if new > was * (1 + tolerance) and new - was > floor_ms:
+                regressions.append(f"{stage['stage']}[{doc}]: p50 {was:.3f} -> {new:.3f} ms (+{(new / was - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(stages: List[Dict]) -> None:
+    cols = ["stage", "doc", "chars", "p50_ms", "p90_ms", "p99_ms", "throughput", "peak_rss_mb"]
+    print(" | ".join(f"{c:>20}" for c in cols))
+    for s in stages:
+        if "docs" not in s or not s["docs"]:
+            print(f"{s['stage']:>20} | {s.get('skipped') or s.get('error')}")
+            continue
+        for doc, r in s["docs"].items():
+            tput = f"{r['throughput_per_s']} {r['unit']}/s"
+            row = [s["stage"], doc, r["chars"], r["p50_ms"], r["p90_ms"], r["p99_ms"], tput, s["peak_rss_mb"]]
+            print(" | ".join(f"{str(v):>20}" for v in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="default: CPU stages (+ model stages with --llm)")
+    parser.add_argument("--stage", help=argparse.SUPPRESS)  # set in the child process
+    parser.add_argument("--llm", action="store_true", help="also run the model stages")
+    parser.add_argument("--pages", nargs="+", type=int, default=DEFAULT_PAGES, help="generated document sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--model", default=GRANITE_MODEL)
+    parser.add_argument("--max-clauses", type=int, default=4)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--prefix-cache", action="store_true", help="simplify_clause_fast reuses the prompt-prefix KV cache")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, help=f"write results as a JSON baseline (default {DEFAULT_BASELINE})")
+    parser.add_argument("--compare", help="baseline JSON to check for p50 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown as a fraction")
+    parser.add_argument("--floor-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage(args)))
+        return 0
+
+    stages = args.stages or CPU_STAGES + (LLM_STAGES if args.llm else [])
+    results = []
+    for stage in stages:
+        cmd = [sys.executable, __file__, "--stage", stage, "--seed", str(args.seed), "--repeats", str(args.repeats),
+               "--model", args.model, "--max-clauses", str(args.max_clauses),
+               "--max-new-tokens", str(args.max_new_tokens), "--pages", *map(str, args.pages)]
+        if args.prefix_cache:
+            cmd.append("--prefix-cache")
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            results.append({"stage": stage, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "pages": args.pages,
+        "seed": args.seed,
+        "repeats": args.repeats,
+        "stages": results,
+    }
+    print_table(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.floor_ms)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nNo p50 regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
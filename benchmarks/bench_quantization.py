@@ -0,0 +1,133 @@
+"""
+bench_quantization.py
+---------------------
+Compare fp32 and dynamic-int8 CPU inference for the Granite model.
+
+Each mode runs in its own subprocess so memory and load time are measured
+from a clean interpreter. The memory saving shows in the RSS after loading
+(int8 peaks while the fp32 weights are quantized). Every clause of the
+sample NDAs is simplified with the app's prompt (prompts.py) and greedy
+decoding, and we record time to first token and decode tokens/sec.
+
+    python benchmarks/bench_quantization.py
+    python benchmarks/bench_quantization.py --modes fp32 int8 --threads 4 --out quant.json
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_MODEL = "ibm-granite/granite-3.2-2b-instruct"
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    """
+    Resident set size right now. The int8 mode loads the fp32 weights
+    before quantizing, so only the current RSS (not the peak) shows the
+    saving.
+    """
+    gc.collect()
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def load_clauses(pattern: str):
+    from analysis import split_into_clauses
+
+    clauses = []
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, pattern))):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        clauses.extend(split_into_clauses(text) or [text])
+    return clauses
+
+
+def run_mode(args) -> dict:
+    from generation import TokenStream
+    from model_loader import load_causal_lm
+    from prompts import SIMPLIFY_SYSTEM_PROMPT, build_simplify_prompt, chat_prompt
+
+    start = time.perf_counter()
+    tokenizer, model = load_causal_lm(args.model, device="cpu", quant=args.mode, num_threads=args.threads)
+    load_s = time.perf_counter() - start
+    rss_after_load = current_rss_mb()
+
+    ttfts, rates, tokens = [], [], 0
+    for clause in load_clauses(args.corpus)[:args.max_clauses]:
+        prompt = chat_prompt(tokenizer, SIMPLIFY_SYSTEM_PROMPT, build_simplify_prompt(clause))
+        # The app's greedy decoding (CLAUSEWISE_LLM_DETERMINISTIC=1)
+        stream = TokenStream(model, tokenizer, prompt, max_new_tokens=args.max_new_tokens, do_sample=False,
+                             repetition_penalty=1.1, pad_token_id=tokenizer.eos_token_id)
+        for _ in stream:
+            pass
+        ttfts.append(stream.ttft or 0.0)
+        rates.append(stream.tokens_per_sec)
+        tokens += stream.token_count
+
+    return {
+        "mode": args.mode,
+        "threads": args.threads or os.cpu_count(),
+        "load_s": round(load_s, 2),
+        "rss_after_load_mb": round(rss_after_load, 1),
+        "rss_after_run_mb": round(current_rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "clauses": len(ttfts),
+        "new_tokens": tokens,
+        "ttft_median_s": round(statistics.median(ttfts), 3) if ttfts else None,
+        "tokens_per_sec_median": round(statistics.median(rates), 2) if rates else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--modes", nargs="+", default=["fp32", "int8"])
+    parser.add_argument("--mode", help=argparse.SUPPRESS)   # set in the child process
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--corpus", default="assets/*.txt", help="glob (relative to the repo) of sample NDAs")
+    parser.add_argument("--max-clauses", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    results = []
+    for mode in args.modes:
+        cmd = [sys.executable, __file__, "--mode", mode, "--model", args.model, "--threads", str(args.threads),
+               "--corpus", args.corpus, "--max-clauses", str(args.max_clauses),
+               "--max-new-tokens", str(args.max_new_tokens)]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    cols = ["mode", "threads", "load_s", "rss_after_load_mb", "peak_rss_mb", "ttft_median_s",
+            "tokens_per_sec_median"]
+    print(" | ".join(f"{c:>22}" for c in cols))
+    for r in results:
+        print(" | ".join(f"{str(r[c]):>22}" for c in cols))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
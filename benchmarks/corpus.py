@@ -0,0 +1,150 @@
+"""
+corpus.py
+---------
+Synthetic NDA corpus for the ClauseWise benchmarks.
+
+Documents are generated from a fixed seed, so every run (and every machine)
+benchmarks the same text. A "page" is 45 lines (about 5,700 characters) of
+numbered sections, sub-clauses and bullets, with parties, dates, amounts and
+risky wording spread through it the way real NDAs have them.
+
+Each size is also written out as a minimal text PDF, so extraction is
+measured through pypdf exactly as an upload would be.
+"""
+
+import io
+import os
+import random
+from typing import Dict, List
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+SAMPLE_NDA = os.path.join(ASSETS_DIR, "sample_nda.txt")
+
+DEFAULT_PAGES = [1, 10, 100, 500]
+LINES_PER_PAGE = 45
+
+_PARTIES = ["Alice Roberts", "Bob Martins", "Acme Corporation", "Globex Ltd.", "Initech LLC", "Umbrella Holdings"]
+_HEADINGS = [
+    "DEFINITIONS", "CONFIDENTIAL INFORMATION", "OBLIGATIONS OF THE RECEIVING PARTY", "EXCLUSIONS",
+    "TERM AND TERMINATION", "REMEDIES", "INDEMNIFICATION", "LIMITATION OF LIABILITY",
+    "GOVERNING LAW", "DISPUTE RESOLUTION", "NON-SOLICITATION", "RETURN OF MATERIALS",
+]
+_SENTENCES = [
+    "The Receiving Party shall hold all Confidential Information in strict confidence and use it solely for the Purpose.",
+    "Confidential Information includes any non-public, proprietary or sensitive business, technical or financial data.",
+    "The Disclosing Party makes no warranty as to the accuracy or completeness of the information disclosed.",
+    "Neither party shall disclose the existence of discussions between the parties without prior written consent.",
+    "The obligations in this Section survive termination of this Agreement for a period of {years} years.",
+    "The Receiving Party shall indemnify the Disclosing Party against all losses arising from any breach.",
+    "Liability of the Receiving Party under this Agreement shall be unlimited.",
+    "This Agreement may be terminated by the Disclosing Party at its sole discretion upon written notice.",
+    "Any dispute shall be settled by binding arbitration in {city} under the rules then in force.",
+    "The Receiving Party shall pay liquidated damages of ${amount} for each unauthorized disclosure.",
+    "Upon request, all materials containing Confidential Information shall be returned or destroyed within {days} days.",
+    "The confidentiality obligations hereunder are perpetual and shall remain in effect indefinitely.",
+    "Nothing in this Agreement grants either party any license under any patent, copyright or trade secret.",
+    "The Receiving Party may disclose Confidential Information where required by law, after prompt notice.",
+]
+_CITIES = ["New York", "London", "Singapore", "Bengaluru", "Delaware"]
+
+
+def _sentence(rng: random.Random) -> str:
+    return rng.choice(_SENTENCES).format(
+        years=rng.randint(1, 10),
+        city=rng.choice(_CITIES),
+        amount=f"{rng.randint(1, 500) * 1000:,}",
+        days=rng.choice([10, 15, 30]),
+    )
+
+
+def generate_nda(pages: int, seed: int = 0) -> List[str]:
+    """Return the text of each page of a synthetic NDA."""
+    rng = random.Random(seed * 100003 + pages)
+    a, b = rng.sample(_PARTIES, 2)
+    lines = [
+        "MUTUAL NON-DISCLOSURE AGREEMENT",
+        "",
+        f"This Non-Disclosure Agreement is made on {rng.randint(1, 28)}/{rng.randint(1, 12)}/20{rng.randint(18, 26)} "
+        f"between {a} (\"Disclosing Party\") and {b} (\"Receiving Party\").",
+        "",
+    ]
+    section = 0
+    while len(lines) < pages * LINES_PER_PAGE:
+        section += 1
+        lines.append(f"{section}. {rng.choice(_HEADINGS)}")
+        for sub in range(1, rng.randint(2, 5) + 1):
+            lines.append(f"{section}.{sub} " + " ".join(_sentence(rng) for _ in range(rng.randint(1, 3))))
+            if rng.random() < 0.25:
+                for _ in range(rng.randint(2, 3)):
+                    lines.append("- " + _sentence(rng))
+        lines.append("")
+
+    return [
+        "\n".join(lines[i:i + LINES_PER_PAGE])
+        for i in range(0, pages * LINES_PER_PAGE, LINES_PER_PAGE)
+    ]
+
+
+def load_sample_nda() -> str:
+    with open(SAMPLE_NDA, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+# -------------------------------------------------------------------
+# 📄 Minimal PDF writer (text only, one Helvetica text block per page)
+# -------------------------------------------------------------------
+def _pdf_escape(line: str) -> str:
+    line = line.encode("latin-1", errors="replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(page_texts: List[str]) -> bytes:
+    """Build a valid PDF whose pages carry the given text (extractable by pypdf)."""
+    objects: List[bytes] = []
+    n = len(page_texts)
+    font_id = 3
+    page_ids = [4 + 2 * i for i in range(n)]
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {n} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(page_texts):
+        ops = ["BT", "/F1 7 Tf", "9 TL", "36 800 Td"]
+        for line in text.split("\n"):
+            ops.append(f"({_pdf_escape(line)}) '")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {page_ids[i] + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def build_corpus(page_counts: List[int] = DEFAULT_PAGES, seed: int = 0) -> Dict[str, Dict]:
+    """
+    {name: {"pages": [...], "text": str, "pdf": bytes}} for the sample NDA
+    plus one generated document per page count.
+    """
+    sample = load_sample_nda()
+    corpus = {"sample": {"pages": [sample], "text": sample}}
+    for count in page_counts:
+        pages = generate_nda(count, seed)
+        corpus[f"{count}p"] = {"pages": pages, "text": "\n".join(pages)}
+    for doc in corpus.values():
+        doc["pdf"] = write_pdf(doc["pages"])
+    return corpus
@@ -0,0 +1,254 @@
+"""
+clause_library.py
+-----------------
+Fair alternative clauses for risky contract clauses.
+
+clause_library.json holds vetted clauses, each tagged with the risk labels
+(risk_matcher.py) it addresses. The library is indexed once as hashed
+TF-IDF vectors (unigrams + bigrams, L2-normalised), stored as a sparse
+column-major matrix in .npy files (indptr / rows / data). The arrays are
+memory-mapped, so opening the index is instant and pages are shared
+between processes. A query reads only the columns of its own terms and
+sums them per library clause, a few milliseconds even with tens of
+thousands of library clauses.
+
+The index is rebuilt automatically when the library file or the vector
+settings change.
+
+    index = get_default_index()
+    for alt in index.search(clause_text, k=3, risks=["Unlimited liability"]):
+        print(alt.score, alt.title)
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+LIBRARY_PATH = os.environ.get(
+    "CLAUSEWISE_CLAUSE_LIBRARY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "clause_library.json"),
+)
+INDEX_DIM = int(os.environ.get("CLAUSEWISE_CLAUSE_INDEX_DIM", str(1 << 18)))   # hashed feature space
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and any are as at be by for from has have in is it its of on or such that the "
+    "this to was were which will with".split()
+)
+
+
+class Alternative(NamedTuple):
+    id: str
+    title: str
+    text: str
+    risks: List[str]
+    score: float        # cosine similarity to the query clause
+
+
+def _default_index_dir() -> str:
+    if os.environ.get("CLAUSEWISE_CLAUSE_INDEX_DIR"):
+        return os.environ["CLAUSEWISE_CLAUSE_INDEX_DIR"]
+    cache_dir = os.environ.get("CLAUSEWISE_CACHE_DIR")
+    if cache_dir:
+        return os.path.join(cache_dir, "clause_index")
+    return os.path.join(tempfile.gettempdir(), "clausewise_clause_index")
+
+
+# -------------------------------------------------------------------
+# 🔢 Hashed TF-IDF features
+# -------------------------------------------------------------------
+def features(text: str, dim: int = INDEX_DIM) -> Dict[int, float]:
+    """Sublinear term frequencies of hashed unigrams and bigrams."""
+    words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts: Dict[int, int] = {}
+    for term in terms:
+        h = zlib.crc32(term.encode("utf-8")) % dim
+        counts[h] = counts.get(h, 0) + 1
+    return {h: 1.0 + math.log(c) for h, c in counts.items()}
+
+
+def _weights(feats: Dict[int, float], idf: np.ndarray):
+    """(columns, L2-normalised tf-idf weights) of one clause."""
+    cols = np.fromiter(feats.keys(), dtype=np.int64, count=len(feats))
+    vals = np.fromiter(feats.values(), dtype=np.float32, count=len(feats)) * idf[cols]
+    norm = float(np.linalg.norm(vals))
+    return cols, (vals / norm if norm else vals)
+
+
+# -------------------------------------------------------------------
+# 📚 Library
+# -------------------------------------------------------------------
+def load_library(path: str = LIBRARY_PATH) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data["clauses"] if isinstance(data, dict) else data
+    return [
+        {"id": str(e.get("id", i)), "title": e.get("title", ""), "text": e["text"], "risks": list(e.get("risks", []))}
+        for i, e in enumerate(entries)
+        if e.get("text")
+    ]
+
+
+def _library_digest(entries: Sequence[Dict], dim: int) -> str:
+    blob = json.dumps({"dim": dim, "clauses": entries}, sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def build_index(entries: Sequence[Dict], index_dir: str, dim: int = INDEX_DIM) -> None:
+    """Write the idf vector, the column-major matrix and meta.json for `entries` into `index_dir`."""
+    os.makedirs(index_dir, exist_ok=True)
+    all_feats = [features(e["text"], dim) for e in entries]
+
+    df = np.zeros(dim, dtype=np.float64)
+    for feats in all_feats:
+        df[list(feats)] += 1
+    idf = (np.log((1 + len(entries)) / (1 + df)) + 1.0).astype(np.float32)
+
+    cols, rows, vals = [], [], []
+    for row, feats in enumerate(all_feats):
+        if feats:
+            c, v = _weights(feats, idf)
+            cols.append(c)
+            vals.append(v)
+            rows.append(np.full(len(c), row, dtype=np.int32))
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    vals = np.concatenate(vals) if vals else np.zeros(0, dtype=np.float32)
+
+    # Column-major (one posting list per feature), so a query reads only its own columns
+    order = np.argsort(cols, kind="stable")
+    arrays = {
+        "idf": idf,
+        "indptr": np.concatenate([[0], np.cumsum(np.bincount(cols, minlength=dim))]).astype(np.int64),
+        "rows": rows[order],
+        "data": vals[order],
+    }
+
+    # Write to temporary names and swap in, so readers never see a half-built index
+    tag = f"{os.getpid()}.tmp"
+    for name, arr in arrays.items():
+        np.save(os.path.join(index_dir, f"{name}.{tag}.npy"), arr)
+    for name in arrays:
+        os.replace(os.path.join(index_dir, f"{name}.{tag}.npy"), os.path.join(index_dir, f"{name}.npy"))
+    with open(os.path.join(index_dir, f"meta.{tag}"), "w", encoding="utf-8") as f:
+        json.dump({"digest": _library_digest(entries, dim), "dim": dim, "count": len(entries)}, f)
+    os.replace(os.path.join(index_dir, f"meta.{tag}"), os.path.join(index_dir, "meta.json"))
+
+
+# -------------------------------------------------------------------
+# 🔎 Index
+# -------------------------------------------------------------------
+class ClauseIndex:
+    """Memory-mapped TF-IDF index over a clause library."""
+
+    def __init__(self, entries: Sequence[Dict], index_dir: str, dim: int = INDEX_DIM):
+        self.entries = list(entries)
+        self.dim = dim
+        self.index_dir = index_dir
+        if not self._is_current():
+            build_index(self.entries, index_dir, dim)
+        load = lambda name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+        self.idf = load("idf")
+        self.indptr = load("indptr")
+        self.rows = load("rows")
+        self.data = load("data")
+
+        by_risk: Dict[str, List[int]] = {}
+        for row, e in enumerate(self.entries):
+            for risk in e["risks"]:
+                by_risk.setdefault(risk, []).append(row)
+        self._rows_by_risk: Dict[str, np.ndarray] = {risk: np.asarray(rows) for risk, rows in by_risk.items()}
+
+    @classmethod
+    def open(cls, library_path: str = LIBRARY_PATH, index_dir: Optional[str] = None,
+             dim: int = INDEX_DIM) -> "ClauseIndex":
+        return cls(load_library(library_path), index_dir or _default_index_dir(), dim)
+
+    def _is_current(self) -> bool:
+        try:
+            with open(os.path.join(self.index_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return meta.get("digest") == _library_digest(self.entries, self.dim)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _rows_for(self, risks: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        """Library rows addressing any of `risks`, or None when no risk is tagged in the library."""
+        found = [self._rows_by_risk[r] for r in risks or () if r in self._rows_by_risk]
+        return np.unique(np.concatenate(found)) if found else None
+
+    @staticmethod
+    def _top(scores: np.ndarray, rows: np.ndarray, k: int) -> List[int]:
+        """The (up to) `k` best-scoring of `rows`, best first."""
+        k = min(k, len(rows))
+        if k <= 0:
+            return []
+        sub = scores[rows]
+        top = np.argpartition(-sub, k - 1)[:k]
+        return [int(rows[i]) for i in top[np.argsort(-sub[top], kind="stable")]]
+
+    def scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of `text` to every library clause."""
+        feats = features(text, self.dim)
+        if not feats:
+            return np.zeros(len(self.entries), dtype=np.float32)
+        cols, weights = _weights(feats, self.idf)
+        starts, ends = self.indptr[cols], self.indptr[cols + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.zeros(len(self.entries), dtype=np.float32)
+        # Gather the posting lists of the query's columns and add them up per row
+        take = np.concatenate([np.arange(a, b) for a, b in zip(starts, ends)])
+        contrib = self.data[take] * np.repeat(weights, lengths)
+        return np.bincount(self.rows[take], weights=contrib, minlength=len(self.entries))
+
+    def search(self, text: str, k: int = 3, risks: Optional[Iterable[str]] = None) -> List[Alternative]:
+        """
+        The `k` library clauses most similar to `text`. With `risks`, clauses
+        addressing one of those risks come first (even if fewer than `k`),
+        then the rest is topped up from the whole library.
+        """
+        if not self.entries or k <= 0:
+            return []
+        scores = self.scores(text)
+        tagged = self._rows_for(risks)
+        picked = self._top(scores, tagged, k) if tagged is not None else []
+        if len(picked) < k:
+            rest = np.arange(len(scores)) if tagged is None else np.setdiff1d(np.arange(len(scores)), tagged)
+            # Untagged clauses only count when they share terms with the query
+            picked += [r for r in self._top(scores, rest, k - len(picked)) if scores[r] > 0]
+        out = []
+        for row in picked:
+            e = self.entries[row]
+            out.append(Alternative(e["id"], e["title"], e["text"], e["risks"], round(float(scores[row]), 4)))
+        return out
+
+    def search_many(self, texts: Sequence[str], k: int = 3,
+                    risks: Optional[Sequence[Iterable[str]]] = None) -> List[List[Alternative]]:
+        risks = risks or [None] * len(texts)
+        return [self.search(t, k, r) for t, r in zip(texts, risks)]
+
+
+_default_index: Optional[ClauseIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_default_index() -> ClauseIndex:
+    """Process-wide index over LIBRARY_PATH (built on first use if missing or stale)."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = ClauseIndex.open()
+        return _default_index
@@ -0,0 +1,206 @@
+"""
+comparison.py
+-------------
+Clause-level comparison of two contracts.
+
+1. Both texts are segmented (segmentation.py) and identical clauses are
+   paired by fingerprint.
+2. The rest get a one-permutation MinHash sketch of their hashed word
+   3-shingles. Banded LSH buckets propose candidate pairs, so the work
+   grows with the number of clauses instead of all pairs of clauses.
+3. Candidates are verified with the exact shingle Jaccard and matched
+   greedily (most similar first). difflib then diffs the words of each
+   matched pair.
+4. Risk labels are compared per pair and for the whole document.
+
+    report = compare_contracts(old_text, new_text)
+    print(report.summary())
+"""
+
+import difflib
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from analysis import clause_risk_labels
+from incremental import clause_fingerprint
+from segmentation import segment
+
+SHINGLE_WORDS = 3
+SKETCH_BINS = 32
+BAND_ROWS = 2
+MATCH_THRESHOLD = 0.3       # minimum shingle Jaccard for "modified" rather than added + removed
+MAX_BUCKET = 64             # ignore LSH buckets of boilerplate shared by many clauses
+
+_EMPTY = 1 << 32
+
+
+class ClauseRef(NamedTuple):
+    index: int
+    number: str         # "2.1(a)" when the clause is numbered
+    text: str
+
+
+class ClauseChange(NamedTuple):
+    old: Optional[ClauseRef]
+    new: Optional[ClauseRef]
+    similarity: float
+    edits: List[Tuple[str, str, str]]       # (op, old words, new words) for modified clauses
+    risks_added: List[str]
+    risks_removed: List[str]
+
+
+class ComparisonReport(NamedTuple):
+    added: List[ClauseChange]
+    removed: List[ClauseChange]
+    modified: List[ClauseChange]
+    unchanged: int
+    risks_introduced: List[str]     # risk labels present only in the new contract
+    risks_resolved: List[str]       # risk labels present only in the old contract
+
+    def summary(self) -> str:
+        lines = [
+            f"{len(self.added)} clauses added, {len(self.removed)} removed, "
+            f"{len(self.modified)} modified, {self.unchanged} unchanged."
+        ]
+        if self.risks_introduced:
+            lines.append("New risks: " + ", ".join(self.risks_introduced))
+        if self.risks_resolved:
+            lines.append("Risks no longer present: " + ", ".join(self.risks_resolved))
+        return "\n".join(lines)
+
+
+# -------------------------------------------------------------------
+# 🔢 Shingles and sketches
+# -------------------------------------------------------------------
+def shingles(text: str, k: int = SHINGLE_WORDS) -> Set[int]:
+    words = text.lower().split()
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)}
+
+
+def sketch(hashes: Set[int], bins: int = SKETCH_BINS) -> List[int]:
+    """One-permutation MinHash: the minimum hash falling in each of `bins` bins."""
+    sig = [_EMPTY] * bins
+    for h in hashes:
+        b = h % bins
+        v = h // bins
+        if v < sig[b]:
+            sig[b] = v
+    return sig
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _candidate_pairs(old_sigs: Dict[int, List[int]], new_sigs: Dict[int, List[int]],
+                     rows: int = BAND_ROWS) -> Set[Tuple[int, int]]:
+    buckets: Dict[Tuple, Tuple[List[int], List[int]]] = {}
+    for side, sigs in ((0, old_sigs), (1, new_sigs)):
+        for idx, sig in sigs.items():
+            for band in range(0, len(sig), rows):
+                key = (band, *sig[band:band + rows])
+                if all(v == _EMPTY for v in key[1:]):
+                    continue
+                buckets.setdefault(key, ([], []))[side].append(idx)
+
+    pairs = set()
+    for olds, news in buckets.values():
+        if not olds or not news or len(olds) * len(news) > MAX_BUCKET * MAX_BUCKET:
+            continue
+        for i in olds:
+            for j in news:
+                pairs.add((i, j))
+    return pairs
+
+
+# -------------------------------------------------------------------
+# ⚖️ Comparison
+# -------------------------------------------------------------------
+def word_edits(old: str, new: str) -> List[Tuple[str, str, str]]:
+    a, b = old.split(), new.split()
+    return [
+        (op, " ".join(a[i1:i2]), " ".join(b[j1:j2]))
+        for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+        if op != "equal"
+    ]
+
+
+def _clause_refs(text: str, min_len: int) -> List[ClauseRef]:
+    return [ClauseRef(i, c.number, c.text) for i, c in enumerate(segment(text).clauses(min_len))]
+
+
+def _ordered_union(lists: Sequence[Sequence[str]]) -> List[str]:
+    seen: Dict[str, None] = {}
+    for labels in lists:
+        for label in labels:
+            seen.setdefault(label, None)
+    return list(seen)
+
+
+def compare_contracts(old_text: str, new_text: str, min_len: int = 20,
+                      threshold: float = MATCH_THRESHOLD) -> ComparisonReport:
+    old = _clause_refs(old_text, min_len)
+    new = _clause_refs(new_text, min_len)
+    old_risks = clause_risk_labels([c.text for c in old])
+    new_risks = clause_risk_labels([c.text for c in new])
+
+    # Identical clauses first (in order, duplicates paired one to one)
+    by_fp: Dict[str, List[int]] = {}
+    for c in old:
+        by_fp.setdefault(clause_fingerprint(c.text), []).append(c.index)
+    matched_old: Dict[int, int] = {}
+    for c in new:
+        bucket = by_fp.get(clause_fingerprint(c.text))
+        if bucket:
+            matched_old[bucket.pop(0)] = c.index
+    unchanged = len(matched_old)
+    matched_new = set(matched_old.values())
+
+    rest_old = [c.index for c in old if c.index not in matched_old]
+    rest_new = [c.index for c in new if c.index not in matched_new]
+    old_sh = {i: shingles(old[i].text) for i in rest_old}
+    new_sh = {j: shingles(new[j].text) for j in rest_new}
+
+    scored = []
+    for i, j in _candidate_pairs({i: sketch(s) for i, s in old_sh.items()},
+                                 {j: sketch(s) for j, s in new_sh.items()}):
+        sim = jaccard(old_sh[i], new_sh[j])
+        if sim >= threshold:
+            # Ties go to the pair closest in relative position
+            drift = abs(i / max(1, len(old)) - j / max(1, len(new)))
+            scored.append((-sim, drift, i, j, sim))
+    scored.sort()
+
+    modified = []
+    pairs: Dict[int, int] = {}
+    for _, _, i, j, sim in scored:
+        if i in pairs or j in matched_new:
+            continue
+        pairs[i] = j
+        matched_new.add(j)
+        modified.append(ClauseChange(
+            old[i], new[j], round(sim, 3), word_edits(old[i].text, new[j].text),
+            [r for r in new_risks[j] if r not in old_risks[i]],
+            [r for r in old_risks[i] if r not in new_risks[j]],
+        ))
+    modified.sort(key=lambda ch: ch.new.index)
+
+    removed = [ClauseChange(old[i], None, 0.0, [], [], list(old_risks[i]))
+               for i in rest_old if i not in pairs]
+    added = [ClauseChange(None, new[j], 0.0, [], list(new_risks[j]), [])
+             for j in rest_new if j not in matched_new]
+
+    before = _ordered_union(old_risks)
+    after = _ordered_union(new_risks)
+    return ComparisonReport(
+        added=added,
+        removed=removed,
+        modified=modified,
+        unchanged=unchanged,
+        risks_introduced=[r for r in after if r not in before],
+        risks_resolved=[r for r in before if r not in after],
+    )
@@ -0,0 +1,68 @@
+"""
+diagnostics.py
+--------------
+Hidden diagnostics panel for the ClauseWise Streamlit apps.
+
+Shows the per-stage records from instrumentation.recorder (slowest stages
+first) and offers them as a JSON lines download. The panel only appears
+when the page is opened with `?diagnostics=1` or CLAUSEWISE_DIAGNOSTICS=1
+is set, so regular users never see it.
+"""
+
+import os
+import uuid
+
+import streamlit as st
+
+import instrumentation
+from instrumentation import recorder, set_session, start_alloc_tracing
+
+
+def diagnostics_enabled() -> bool:
+    if os.environ.get("CLAUSEWISE_DIAGNOSTICS", "0") == "1":
+        return True
+    try:
+        return st.query_params.get("diagnostics") == "1"
+    except Exception:
+        return False
+
+
+def tag_session() -> str:
+    """Tag this script run's records with a per-browser-session id."""
+    if "diagnostics_session" not in st.session_state:
+        st.session_state.diagnostics_session = uuid.uuid4().hex[:8]
+    set_session(st.session_state.diagnostics_session)
+    return st.session_state.diagnostics_session
+
+
+def render_diagnostics_panel() -> None:
+    if not diagnostics_enabled():
+        return
+
+    session = st.session_state.get("diagnostics_session")
+    with st.sidebar.expander("🩺 Diagnostics", expanded=False):
+        only_mine = st.checkbox("This session only", value=True, key="diag_only_session")
+        records = recorder.records(session=session if only_mine else None)
+
+        if not records:
+            st.caption("No stage records yet.")
+        else:
+            st.dataframe(recorder.summary(records), use_container_width=True, hide_index=True)
+            st.caption(f"{len(records)} records (newest last)")
+            st.download_button(
+                "Export JSONL",
+                data=recorder.to_jsonl(records),
+                file_name="clausewise_metrics.jsonl",
+                mime="application/jsonl",
+                key="diag_export",
+            )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            # Other sessions' records are theirs to clear
+            if session is not None and st.button("Clear", key="diag_clear", help="Clear this session's records"):
+                recorder.clear(session=session)
+        with col2:
+            if not instrumentation.TRACE_ALLOC and st.button("Trace allocations", key="diag_trace"):
+                # Adds tracemalloc overhead to every call from now on
+                start_alloc_tracing()
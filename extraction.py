@@ -0,0 +1,142 @@
+"""
+extraction.py
+-------------
+Streaming and page-parallel PDF text extraction for ClauseWise.
+
+Pages are yielded one at a time so callers can show progress while the
+document is read. Large PDFs can be split into page ranges and extracted
+on a process pool; pages still come back in document order. A PageMap keeps the character offset of every page
+so clauses can be linked back to their source page.
+"""
+
+import io
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+PAGE_SEPARATOR = "\n"
+
+# Use the process pool only when it pays for the worker start-up cost
+PARALLEL_MIN_PAGES = int(os.environ.get("CLAUSEWISE_PDF_PARALLEL_MIN_PAGES", "48"))
+PAGES_PER_TASK = int(os.environ.get("CLAUSEWISE_PDF_PAGES_PER_TASK", "16"))
+PDF_WORKERS = int(os.environ.get("CLAUSEWISE_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class PdfPage(NamedTuple):
+    index: int      # 0-based page number
+    count: int      # total pages in the document
+    text: str
+
+
+# -------------------------------------------------------------------
+# 📍 Page offsets
+# -------------------------------------------------------------------
+class PageMap:
+    """
+    Start offset of each page in the joined document text.
+    """
+
+    def __init__(self, starts: Optional[List[int]] = None):
+        self.starts = starts or []
+
+    def add(self, start: int) -> None:
+        self.starts.append(start)
+
+    def page_for(self, offset: int) -> int:
+        """1-based page number containing the character at `offset`."""
+        if not self.starts:
+            return 1
+        return max(1, bisect_right(self.starts, offset))
+
+    def __len__(self):
+        return len(self.starts)
+
+
+# -------------------------------------------------------------------
+# 📄 Page extraction
+# -------------------------------------------------------------------
+def _page_text(page) -> str:
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        return ""
+
+
+_worker_reader = None
+
+
+def _init_worker(data: bytes) -> None:
+    # Each worker parses the PDF once and then serves many page ranges
+    global _worker_reader
+    from pypdf import PdfReader
+    _worker_reader = PdfReader(io.BytesIO(data))
+
+
+def _extract_range(bounds: Tuple[int, int]) -> List[str]:
+    start, stop = bounds
+    return [_page_text(_worker_reader.pages[i]) for i in range(start, stop)]
+
+
+def _as_bytes(source: Union[bytes, bytearray, io.IOBase]) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    data = source.read()
+    try:
+        source.seek(0)
+    except Exception:
+        pass
+    return data
+
+
+def iter_pdf_pages(source, workers: Optional[int] = None) -> Iterator[PdfPage]:
+    """
+    Yield PdfPage tuples in document order.
+
+    `source` is raw bytes or a file-like object. With workers > 1 and a
+    document of at least PARALLEL_MIN_PAGES pages, page ranges are extracted
+    on a process pool and yielded as soon as each range (in order) is ready.
+    """
+    from pypdf import PdfReader  # deferred: keeps `import extraction` cheap
+
+    data = _as_bytes(source)
+    reader = PdfReader(io.BytesIO(data))
+    count = len(reader.pages)
+    workers = PDF_WORKERS if workers is None else workers
+
+    if workers <= 1 or count < PARALLEL_MIN_PAGES:
+        for i, page in enumerate(reader.pages):
+            yield PdfPage(i, count, _page_text(page))
+        return
+
+    ranges = [(s, min(s + PAGES_PER_TASK, count)) for s in range(0, count, PAGES_PER_TASK)]
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,))
+    try:
+        futures = [pool.submit(_extract_range, r) for r in ranges]
+        for (start, _), fut in zip(ranges, futures):
+            for offset, text in enumerate(fut.result()):
+                yield PdfPage(start + offset, count, text)
+    finally:
+        # A consumer that stops early (e.g. NDA rejection) should not wait for the rest
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def join_pages(pages: Iterable[PdfPage], on_page: Optional[Callable[[PdfPage], None]] = None) -> Tuple[str, PageMap]:
+    """
+    Join streamed pages into one document, recording each page's start offset.
+    """
+    parts: List[str] = []
+    page_map = PageMap()
+    pos = 0
+    for page in pages:
+        if parts:
+            parts.append(PAGE_SEPARATOR)
+            pos += len(PAGE_SEPARATOR)
+        page_map.add(pos)
+        parts.append(page.text)
+        pos += len(page.text)
+        if on_page:
+            on_page(page)
+    return "".join(parts), page_map
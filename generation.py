@@ -0,0 +1,584 @@
+"""
+generation.py
+-------------
+Model-side generation helpers shared by the ClauseWise UIs.
+
+Functions take the model and tokenizer explicitly (like chat_with_model in
+app.py) so they work with either the Granite or the DistilGPT2 setup.
+"""
+
+import contextlib
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import torch
+from transformers import DynamicCache, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+from instrumentation import measure
+
+
+# -------------------------------------------------------------------
+# 📦 Length-bucketed batching
+# -------------------------------------------------------------------
+def plan_batches(lengths: Sequence[int], max_new_tokens: int, max_batch_tokens: int = 8192,
+                 max_batch_size: int = 8) -> List[List[int]]:
+    """
+    Group prompt indices into batches of similar length.
+
+    Prompts are sorted by token length so each batch pads to a close maximum;
+    a batch is closed once batch_size * (longest prompt + max_new_tokens)
+    would exceed `max_batch_tokens`. A prompt that is over budget on its own
+    still gets a batch of one.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for i in order:
+        longest = max(lengths[i], max((lengths[j] for j in current), default=0))
+        cost = (len(current) + 1) * (longest + max_new_tokens)
+        if current and (cost > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def generate_batch(model, tokenizer, prompts: Sequence[str], max_new_tokens: int = 200,
+                   max_batch_tokens: int = 8192, max_batch_size: int = 8,
+                   max_prompt_tokens: int = 2048, **gen_kwargs: Any) -> List[str]:
+    """
+    Generate a completion for every prompt with one model.generate per bucket.
+
+    Prompts are tokenized once, left-padded inside each length bucket and the
+    decoded completions are returned in the original prompt order.
+    """
+    if not prompts:
+        return []
+
+    encoded = tokenizer(list(prompts), truncation=True, max_length=max_prompt_tokens)["input_ids"]
+    lengths = [len(ids) for ids in encoded]
+    results: List[Optional[str]] = [None] * len(prompts)
+
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+
+    try:
+        for batch in plan_batches(lengths, max_new_tokens, max_batch_tokens, max_batch_size):
+            inputs = tokenizer.pad({"input_ids": [encoded[i] for i in batch]},
+                                   padding=True, return_tensors="pt").to(model.device)
+            with measure("generation.batch", prompts=len(batch)) as m, torch.inference_mode():
+                output_ids = model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **gen_kwargs
+                )
+                new_tokens = output_ids[:, inputs["input_ids"].shape[1]:]
+                m.tokens = int((new_tokens != tokenizer.pad_token_id).sum())
+            texts = tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+            for i, text in zip(batch, texts):
+                results[i] = text.strip()
+    finally:
+        tokenizer.padding_side = padding_side
+
+    return results
+
+
+# -------------------------------------------------------------------
+# 🎯 Constrained label scoring
+# -------------------------------------------------------------------
+class LabelScore(NamedTuple):
+    label: str
+    logprob: float      # mean log-likelihood per label token after the prompt
+    prob: float         # share of the probability mass within the label set
+
+
+def _label_token_ids(tokenizer, label: str) -> List[int]:
+    """Tokens of `label`, appended to the (possibly truncated) prompt ids as they are."""
+    return tokenizer(label, add_special_tokens=False)["input_ids"]
+
+
+def _repeat_cache(cache, n: int):
+    if not hasattr(cache, "get_seq_length"):
+        cache = DynamicCache.from_legacy_cache(cache)
+    if hasattr(cache, "batch_repeat_interleave"):
+        cache.batch_repeat_interleave(n)
+        return cache
+    legacy = cache.to_legacy_cache()
+    return DynamicCache.from_legacy_cache(
+        tuple((k.expand(n, -1, -1, -1), v.expand(n, -1, -1, -1)) for k, v in legacy)
+    )
+
+
+def score_labels(model, tokenizer, prompt: str, labels: Sequence[str], max_prompt_tokens: int = 2048,
+                 lock=None, prefix_cache: Optional["PrefixKVCache"] = None,
+                 prefix: Optional[str] = None) -> List[LabelScore]:
+    """
+    Rank `labels` by their log-likelihood as the continuation of `prompt`.
+
+    The prompt is prefilled once. Its KV cache is then shared by all labels,
+    which are scored together in a single batched forward pass. The total
+    cost is about one prefill plus a few tokens per label. Each label's
+    log-likelihood is averaged over its tokens, so long labels are not
+    penalised for their length. The result is deterministic and ordered
+    from most to least likely. With a
+    `prefix_cache` and the prompt's constant `prefix`, only the rest of the
+    prompt is prefilled.
+    """
+    if not labels:
+        return []
+    prompt_ids = tokenizer(prompt, truncation=True, max_length=max_prompt_tokens)["input_ids"]
+    label_ids = [_label_token_ids(tokenizer, label) for label in labels]
+    n, width = len(labels), max(len(ids) for ids in label_ids)
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+    tokens = torch.full((n, width), pad_id, dtype=torch.long)
+    mask = torch.zeros((n, width), dtype=torch.long)
+    for i, ids in enumerate(label_ids):
+        tokens[i, :len(ids)] = torch.tensor(ids)
+        mask[i, :len(ids)] = 1
+    tokens, mask = tokens.to(model.device), mask.to(model.device)
+    p = len(prompt_ids)
+
+    with measure("generation.score_labels", prompt_tokens=p, labels=n) as m, \
+            lock or contextlib.nullcontext(), torch.inference_mode():
+        past, reused = (None, 0) if prefix_cache is None or prefix is None else prefix_cache.past_for(prompt_ids, prefix)
+        prefill = model(torch.tensor([prompt_ids[reused:]], device=model.device), past_key_values=past, use_cache=True)
+        m.meta["reused_tokens"] = reused
+        first = torch.log_softmax(prefill.logits[0, -1].float(), dim=-1)
+
+        rest = None
+        if width > 1:
+            # Right-padded labels after the shared prompt. A label's last token
+            # predicts nothing we need, and padded slots are masked out.
+            out = model(
+                input_ids=tokens[:, :-1],
+                attention_mask=torch.cat([torch.ones((n, p), dtype=torch.long, device=model.device),
+                                          mask[:, :-1]], dim=1),
+                position_ids=torch.arange(p, p + width - 1, device=model.device).expand(n, -1),
+                past_key_values=_repeat_cache(prefill.past_key_values, n),
+                use_cache=True,
+            )
+            rest = torch.log_softmax(out.logits.float(), dim=-1)
+        m.tokens = int(mask.sum())
+
+    scores = []
+    for i, ids in enumerate(label_ids):
+        lp = first[ids[0]]
+        if len(ids) > 1:
+            lp = lp + rest[i, torch.arange(len(ids) - 1, device=rest.device), tokens[i, 1:len(ids)]].sum()
+        scores.append(float(lp) / len(ids))
+
+    probs = torch.softmax(torch.tensor(scores), dim=0).tolist()
+    ranked = [LabelScore(label, lp, pr) for label, lp, pr in zip(labels, scores, probs)]
+    return sorted(ranked, key=lambda s: -s.logprob)
+
+
+# -------------------------------------------------------------------
+# ♻️ Constant prompt prefixes
+# -------------------------------------------------------------------
+_PREFIX_MARKER = "\x00CLAUSEWISE_PREFIX\x00"
+
+
+def constant_prefix(render: Callable[[str], str]) -> str:
+    """
+    The part of a prompt template that comes before its variable input, e.g.
+    constant_prefix(lambda x: build_chat_prompt(SYSTEM, build_simplify_prompt(x))).
+    """
+    text = render(_PREFIX_MARKER)
+    return text[:text.index(_PREFIX_MARKER)]
+
+
+class PrefixKVCache:
+    """
+    Per-process key/value states of constant prompt prefixes (the system
+    prompt and instruction header in front of every clause).
+
+    Each prefix is prefilled once. A prompt that starts with it gets a copy of
+    the cache cropped to the shared tokens, so only the clause-specific suffix
+    is prefilled. Copies are needed because generate extends the cache in
+    place. Call past_for while holding the model lock: the first call for a
+    prefix runs the model.
+    """
+
+    def __init__(self, model, tokenizer, max_prefixes: int = 8):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_prefixes = max_prefixes
+        self._entries: Dict[str, Tuple[List[int], Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.reused_tokens = 0
+
+    def _entry(self, prefix: str) -> Tuple[List[int], Any]:
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None:
+                ids = self.tokenizer(prefix)["input_ids"]
+                with measure("generation.prefix", prompt_tokens=len(ids)), torch.inference_mode():
+                    out = self.model(torch.tensor([ids], device=self.model.device), use_cache=True)
+                cache = out.past_key_values
+                if not hasattr(cache, "crop"):
+                    cache = DynamicCache.from_legacy_cache(cache)
+                if len(self._entries) >= self.max_prefixes:
+                    self._entries.pop(next(iter(self._entries)))
+                entry = self._entries[prefix] = (ids, cache)
+            return entry
+
+    def past_for(self, prompt_ids: Sequence[int], prefix: str) -> Tuple[Optional[Any], int]:
+        """(copy of the cached KV states, number of prompt tokens they cover), or (None, 0)."""
+        ids, cache = self._entry(prefix)
+        # Tokenization may merge across the prefix boundary; keep >= 1 token to prefill
+        common = min(common_prefix_len(ids, prompt_ids), len(prompt_ids) - 1)
+        if common <= 0:
+            return None, 0
+        past = copy.deepcopy(cache)
+        past.crop(common)
+        self.hits += 1
+        self.reused_tokens += common
+        return past, common
+
+    def stats(self) -> Dict[str, int]:
+        return {"prefixes": len(self._entries), "hits": self.hits, "reused_tokens": self.reused_tokens}
+
+
+# -------------------------------------------------------------------
+# 🌊 Token streaming with latency metrics
+# -------------------------------------------------------------------
+def find_stop(text: str, stop: Sequence[str]) -> int:
+    """Index of the earliest stop sequence in `text`, or -1."""
+    hits = [i for i in (text.find(s) for s in stop) if i >= 0]
+    return min(hits) if hits else -1
+
+
+def _safe_prefix_len(text: str, stop: Sequence[str]) -> int:
+    """
+    Length of `text` that can be shown without risking a partial stop
+    sequence (e.g. "\nUs" before "er:" arrives) leaking to the user.
+    """
+    keep = len(text)
+    for s in stop:
+        for k in range(min(len(s) - 1, len(text)), 0, -1):
+            if text.endswith(s[:k]):
+                keep = min(keep, len(text) - k)
+                break
+    return keep
+
+
+class _StopOnStrings(StoppingCriteria):
+    """Stop generation once the recent output contains a stop sequence."""
+
+    def __init__(self, tokenizer, stop: Sequence[str], prompt_len: int, lookback: int = 16):
+        self.tokenizer = tokenizer
+        self.stop = list(stop)
+        self.prompt_len = prompt_len
+        self.lookback = lookback
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        tail = input_ids[0, max(self.prompt_len, input_ids.shape[1] - self.lookback):]
+        return find_stop(self.tokenizer.decode(tail, skip_special_tokens=True), self.stop) >= 0
+
+
+class _CountingStreamer(TextIteratorStreamer):
+    """TextIteratorStreamer that reports every generated token to a TokenStream."""
+
+    def __init__(self, tokenizer, owner: "TokenStream"):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.owner = owner
+
+    def put(self, value):
+        if not (self.skip_prompt and self.next_tokens_are_prompt):
+            self.owner._on_tokens(value.numel())
+        super().put(value)
+
+
+class TokenStream:
+    """
+    Run model.generate on a background thread and iterate decoded text chunks
+    as tokens are produced.
+
+    After (or during) iteration the stream exposes `text`, `token_count`,
+    `progress` (tokens out of max_new_tokens), `ttft` (seconds to the first
+    generated token) and `tokens_per_sec` (decode rate after the first token).
+
+    With `stop` sequences, generation halts as soon as one appears and the
+    stop sequence itself (and anything after it) is never yielded. A `lock`
+    (e.g. InferenceWorker.model_lock) is held for the whole generate call.
+    """
+
+    def __init__(self, model, tokenizer, prompt: str, max_new_tokens: int = 256,
+                 max_prompt_tokens: int = 2048, stop: Optional[Sequence[str]] = None,
+                 lock=None, **gen_kwargs: Any):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.stop = list(stop or [])
+        self.lock = lock
+        self.gen_kwargs = gen_kwargs
+        self.text = ""
+        self.prompt_tokens = 0
+        self.token_count = 0
+        self.ttft: Optional[float] = None
+        self.elapsed: Optional[float] = None
+        self.output = None      # model.generate return value, once finished
+        self._start = 0.0
+        self._error: Optional[BaseException] = None
+
+    def _on_tokens(self, n: int) -> None:
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self._start
+        self.token_count += n
+
+    def _run(self, inputs, streamer, gen_kwargs) -> None:
+        try:
+            with self.lock or contextlib.nullcontext(), torch.inference_mode():
+                self.output = self.model.generate(
+                    **inputs,
+                    streamer=streamer,
+                    max_new_tokens=self.max_new_tokens,
+                    **gen_kwargs
+                )
+        except BaseException as e:
+            self._error = e
+            streamer.end()
+
+    def __iter__(self) -> Iterator[str]:
+        inputs = self.tokenizer(self.prompt, return_tensors="pt", truncation=True,
+                                max_length=self.max_prompt_tokens).to(self.model.device)
+        self.prompt_tokens = inputs["input_ids"].shape[1]
+        streamer = _CountingStreamer(self.tokenizer, self)
+
+        gen_kwargs = dict(self.gen_kwargs)
+        if self.stop:
+            criteria = StoppingCriteriaList(gen_kwargs.pop("stopping_criteria", None) or [])
+            criteria.append(_StopOnStrings(self.tokenizer, self.stop, self.prompt_tokens))
+            gen_kwargs["stopping_criteria"] = criteria
+
+        with measure("generation", prompt_tokens=self.prompt_tokens) as m:
+            self._start = time.perf_counter()
+            worker = threading.Thread(target=self._run, args=(inputs, streamer, gen_kwargs), daemon=True)
+            worker.start()
+
+            raw = ""
+            emitted = 0
+            stopped = False
+            for chunk in streamer:
+                if stopped or not chunk:
+                    continue
+                raw += chunk
+                if self.stop:
+                    cut = find_stop(raw, self.stop)
+                    if cut >= 0:
+                        raw = raw[:cut]
+                        stopped = True
+                    end = len(raw) if stopped else _safe_prefix_len(raw, self.stop)
+                else:
+                    end = len(raw)
+                if end > emitted:
+                    self.text = raw[:end]
+                    yield raw[emitted:end]
+                    emitted = end
+            if emitted < len(raw):
+                self.text = raw
+                yield raw[emitted:]
+            worker.join()
+            self.elapsed = time.perf_counter() - self._start
+            m.tokens = self.token_count
+            m.meta["ttft_s"] = round(self.ttft or 0.0, 4)
+
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def progress(self) -> float:
+        return min(1.0, self.token_count / max(1, self.max_new_tokens))
+
+    @property
+    def tokens_per_sec(self) -> float:
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._start
+        if self.ttft is None or self.token_count < 2 or elapsed <= self.ttft:
+            return 0.0
+        return (self.token_count - 1) / (elapsed - self.ttft)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "new_tokens": self.token_count,
+            "ttft_s": round(self.ttft or 0.0, 3),
+            "tokens_per_sec": round(self.tokens_per_sec, 2),
+            "total_s": round(self.elapsed or 0.0, 3),
+        }
+
+
+# -------------------------------------------------------------------
+# 🚀 Assisted (speculative) decoding
+# -------------------------------------------------------------------
+def tokenizers_compatible(tokenizer, draft_tokenizer) -> bool:
+    """Same vocabulary and end-of-sequence token, so draft token ids can be verified directly."""
+    if len(tokenizer) != len(draft_tokenizer) or tokenizer.eos_token_id != draft_tokenizer.eos_token_id:
+        return False
+    return tokenizer.get_vocab() == draft_tokenizer.get_vocab()
+
+
+def assisted_kwargs(tokenizer, draft_model, draft_tokenizer, num_assistant_tokens: Optional[int] = None,
+                    allow_universal: bool = False) -> Dict[str, Any]:
+    """
+    generate kwargs that let `draft_model` propose tokens for the target
+    model to verify. The draft must share the target's tokenizer. With
+    `allow_universal`, other drafts (distilgpt2 for Granite) go through
+    universal assisted decoding, which re-tokenizes the draft's text
+    (transformers >= 4.46, greedy decoding, usually far lower acceptance).
+    """
+    kwargs: Dict[str, Any] = {"assistant_model": draft_model}
+    if not tokenizers_compatible(tokenizer, draft_tokenizer):
+        if not allow_universal:
+            raise ValueError("the draft model does not share the target model's tokenizer")
+        kwargs.update(tokenizer=tokenizer, assistant_tokenizer=draft_tokenizer)
+    if num_assistant_tokens:
+        draft_model.generation_config.num_assistant_tokens = num_assistant_tokens
+    return kwargs
+
+
+def draft_context_fits(draft_model, draft_tokenizer, prompt: str, max_new_tokens: int) -> bool:
+    """Whether the prompt plus the reply fits in the draft's (often much shorter) context window."""
+    config = draft_model.config
+    limit = getattr(config, "max_position_embeddings", None) or getattr(config, "n_positions", None)
+    if not limit:
+        return True
+    return len(draft_tokenizer(prompt)["input_ids"]) + max_new_tokens <= limit
+
+
+class AcceptanceStats:
+    """Draft tokens proposed and accepted, as reported by the candidate generator."""
+
+    def __init__(self):
+        self.steps = 0          # verification passes of the target model
+        self.proposed = 0       # candidate tokens (in target tokens)
+        self.accepted = 0
+
+    @property
+    def rate(self) -> float:
+        return self.accepted / self.proposed if self.proposed else 0.0
+
+
+@contextlib.contextmanager
+def count_acceptance(model) -> Iterator[AcceptanceStats]:
+    """
+    Count proposals and matches of every assisted generate call on `model`
+    inside the block. The candidate generator is wrapped per call, so
+    universal (cross-tokenizer) drafts are counted in target tokens too.
+    Not thread-safe: for benchmarks, not for a shared model.
+    """
+    stats = AcceptanceStats()
+    make_generator = model._get_candidate_generator
+
+    def counted(*args, **kwargs):
+        generator = make_generator(*args, **kwargs)
+        get_candidates, update = generator.get_candidates, generator.update_candidate_strategy
+
+        def get_counted(input_ids, *a, **kw):
+            candidates = get_candidates(input_ids, *a, **kw)
+            stats.proposed += candidates[0].shape[-1] - input_ids.shape[-1]
+            return candidates
+
+        def update_counted(input_ids, scores, num_matches):
+            stats.steps += 1
+            stats.accepted += int(num_matches)
+            return update(input_ids, scores, num_matches)
+
+        generator.get_candidates = get_counted
+        generator.update_candidate_strategy = update_counted
+        return generator
+
+    model._get_candidate_generator = counted
+    try:
+        yield stats
+    finally:
+        del model._get_candidate_generator
+
+
+# -------------------------------------------------------------------
+# 💬 Chat sessions with KV-cache reuse
+# -------------------------------------------------------------------
+def common_prefix_len(a: Sequence[int], b: Sequence[int]) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class ChatSession:
+    """
+    Per-conversation state that keeps the model's past_key_values for the
+    tokens already processed (previous prompt + generated reply).
+
+    Each new turn is tokenized in full and compared with the cached token
+    ids; the cache is cropped to the longest common prefix and only the
+    remaining tokens are prefilled. When the history window slides, the
+    prefix no longer matches and the turn is encoded from scratch.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.cache = None
+        self.token_ids: List[int] = []
+        self.reused_tokens = 0
+        self.prefill_tokens = 0
+
+    def _reusable_cache(self, ids: List[int]):
+        cache, self.cache = self.cache, None   # generate mutates it in place
+        if cache is None:
+            return None, 0
+        common = min(common_prefix_len(self.token_ids, ids), len(ids) - 1)
+        if common <= 0:
+            return None, 0
+        if not hasattr(cache, "crop"):
+            cache = DynamicCache.from_legacy_cache(cache)
+        cache.crop(common)
+        return cache, common
+
+    def stream_reply(self, model, tokenizer, prompt: str, max_new_tokens: int = 120,
+                     stop: Optional[Sequence[str]] = None, **gen_kwargs: Any) -> Iterator[str]:
+        ids = tokenizer(prompt)["input_ids"]
+        cache, reused = self._reusable_cache(ids)
+        self.reused_tokens = reused
+        self.prefill_tokens = len(ids) - reused
+        if cache is not None:
+            gen_kwargs["past_key_values"] = cache
+
+        stream = TokenStream(model, tokenizer, prompt, max_new_tokens=max_new_tokens,
+                             stop=stop, return_dict_in_generate=True, **gen_kwargs)
+        try:
+            yield from stream
+        except Exception:
+            self.reset()
+            raise
+
+        output = stream.output
+        if output is None or getattr(output, "past_key_values", None) is None:
+            self.reset()
+            return
+        cache = output.past_key_values
+        if not hasattr(cache, "get_seq_length"):
+            cache = DynamicCache.from_legacy_cache(cache)
+        self.cache = cache
+        # The last sampled token has no KV entry yet
+        self.token_ids = output.sequences[0].tolist()[:cache.get_seq_length()]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_tokens": len(self.token_ids),
+            "reused_tokens": self.reused_tokens,
+            "prefill_tokens": self.prefill_tokens,
+        }
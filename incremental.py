@@ -0,0 +1,126 @@
+"""
+incremental.py
+--------------
+Clause-level fingerprints for incremental re-analysis.
+
+When a revised NDA is uploaded, most clauses are unchanged. Each clause is
+fingerprinted by its whitespace-normalised text, and per-clause results
+(risk labels, entities, LLM simplifications) are stored under
+(stage, config, fingerprint). The next version only computes the clauses
+whose fingerprint has not been seen, so a revision round costs time
+proportional to the diff, not the document.
+"""
+
+import hashlib
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from analysis_cache import AnalysisCache
+
+
+def clause_fingerprint(text: str) -> str:
+    """Stable id of a clause's wording; re-wrapped lines or spacing don't change it."""
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class ClauseDiff(NamedTuple):
+    added: List[int]        # indices into the new clause list
+    removed: List[int]      # indices into the old clause list
+    unchanged: int
+
+    def summary(self) -> str:
+        return f"{len(self.added)} new/changed, {len(self.removed)} removed, {self.unchanged} unchanged"
+
+
+def diff_fingerprints(old: Sequence[str], new: Sequence[str]) -> ClauseDiff:
+    """Multiset diff of two fingerprint lists (a modified clause is one removal plus one addition)."""
+    remaining = Counter(old)
+    added = []
+    for i, fp in enumerate(new):
+        if remaining[fp] > 0:
+            remaining[fp] -= 1
+        else:
+            added.append(i)
+    kept = Counter(new)
+    removed = []
+    for i, fp in enumerate(old):
+        if kept[fp] > 0:
+            kept[fp] -= 1
+        else:
+            removed.append(i)
+    return ClauseDiff(added, removed, len(new) - len(added))
+
+
+class StageRun(NamedTuple):
+    results: List[Any]
+    reused: int             # clauses answered from the store
+    computed: int           # distinct clauses passed to compute_many
+
+
+class ClauseResultStore:
+    """
+    Per-clause result cache shared by every document and revision.
+    Backed by AnalysisCache, so it is an LRU with an optional disk tier and
+    safe to share between Streamlit sessions.
+    """
+
+    def __init__(self, max_entries: int = 4096, disk_dir: Optional[str] = None):
+        self.cache = AnalysisCache(max_entries=max_entries, disk_dir=disk_dir)
+
+    @staticmethod
+    def _salt(stage: str, config: Optional[Dict[str, Any]]) -> str:
+        blob = json.dumps({"stage": stage, "config": config or {}}, sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _key(salt: str, clause: str) -> str:
+        return f"{salt[:16]}-{clause_fingerprint(clause)}"
+
+    def get(self, stage: str, clause: str, config: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        entry = self.cache.get(self._key(self._salt(stage, config), clause))
+        return None if entry is None else entry["value"]
+
+    def put(self, stage: str, clause: str, value: Any, config: Optional[Dict[str, Any]] = None) -> None:
+        self.cache.put(self._key(self._salt(stage, config), clause), {"value": value})
+
+    def map(self, stage: str, clauses: Sequence[str], compute_many: Callable[[List[str]], List[Any]],
+            config: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Result for every clause, calling `compute_many` once with only the
+        clauses that have no stored result (each distinct clause once).
+        """
+        return self.map_counted(stage, clauses, compute_many, config).results
+
+    def map_counted(self, stage: str, clauses: Sequence[str], compute_many: Callable[[List[str]], List[Any]],
+                    config: Optional[Dict[str, Any]] = None,
+                    keep: Optional[Callable[[Any], bool]] = None) -> StageRun:
+        """
+        Like map, plus how many clauses were reused. The counts are returned
+        rather than kept on the store, which is shared between sessions.
+        Computed values failing `keep` are returned but not stored.
+        """
+        salt = self._salt(stage, config)
+        keys = [self._key(salt, c) for c in clauses]
+        results: List[Any] = [None] * len(clauses)
+        todo: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            entry = self.cache.get(key)
+            if entry is None:
+                todo.setdefault(key, []).append(i)
+            else:
+                results[i] = entry["value"]
+
+        if todo:
+            first = [idx[0] for idx in todo.values()]
+            computed = compute_many([clauses[i] for i in first])
+            for (key, idx), value in zip(todo.items(), computed):
+                if keep is None or keep(value):
+                    self.cache.put(key, {"value": value})
+                for i in idx:
+                    results[i] = value
+
+        return StageRun(results, len(clauses) - sum(len(v) for v in todo.values()), len(todo))
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
@@ -0,0 +1,186 @@
+"""
+inference_worker.py
+-------------------
+Single in-process inference worker for ClauseWise.
+
+One worker thread owns the model. Streamlit sessions submit prompts through
+a queue and get a concurrent.futures.Future back. Requests that arrive within
+a short window and use the same generation settings are coalesced into one
+micro-batch and run through generation.generate_batch. Concurrent users then
+share generate calls instead of contending for the model one call at a time.
+`submit_many` queues a whole list as one request, so generate_batch buckets
+all of it by length instead of taking it in arrival-order windows.
+
+Other model work that returns a result, such as label scoring, is queued
+with `call` and runs on the worker thread between batches. Streaming paths
+(TokenStream, ChatSession) yield tokens to the caller and can't be queued.
+They pass `model_lock` so their generate calls are serialized with the
+worker.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from generation import generate_batch
+
+BATCH_WINDOW_MS = float(os.environ.get("CLAUSEWISE_BATCH_WINDOW_MS", "25"))
+
+
+class _Request(NamedTuple):
+    prompts: Tuple[str, ...]
+    max_new_tokens: int
+    gen_kwargs: Dict[str, Any]
+    futures: Tuple[Future, ...]
+    job: Optional[Callable[[], Any]] = None
+
+    @property
+    def key(self) -> Tuple:
+        # Only requests with identical generation settings can share a batch
+        return (self.max_new_tokens, tuple(sorted((k, repr(v)) for k, v in self.gen_kwargs.items())))
+
+
+class InferenceWorker:
+    """
+    Queue-fed generation worker with time-window micro-batching.
+    """
+
+    def __init__(self, model, tokenizer, batch_window_ms: float = BATCH_WINDOW_MS,
+                 max_batch_size: int = 8, max_batch_tokens: int = 8192):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.model_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="inference-worker", daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------------------------------
+    # Client side
+    # ---------------------------------------------------------------
+    def submit(self, prompt: str, max_new_tokens: int = 200, **gen_kwargs: Any) -> Future:
+        return self.submit_many([prompt], max_new_tokens, **gen_kwargs)[0]
+
+    def submit_many(self, prompts: Sequence[str], max_new_tokens: int = 200, **gen_kwargs: Any) -> List[Future]:
+        """One future per prompt; the list is queued (and length-bucketed) as a single request."""
+        futures = tuple(Future() for _ in prompts)
+        if futures:
+            self._put(_Request(tuple(prompts), max_new_tokens, gen_kwargs, futures))
+        return list(futures)
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Run `fn(*args, **kwargs)` on the worker thread, holding `model_lock`."""
+        future: Future = Future()
+        self._put(_Request((), 0, {}, (future,), job=lambda: fn(*args, **kwargs)))
+        return future
+
+    def _put(self, req: _Request) -> None:
+        if self._closed:
+            raise RuntimeError("InferenceWorker is closed")
+        self._queue.put(req)
+
+    def generate(self, prompt: str, max_new_tokens: int = 200, timeout: Optional[float] = None,
+                 **gen_kwargs: Any) -> str:
+        return self.submit(prompt, max_new_tokens, **gen_kwargs).result(timeout)
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queued": self._queue.qsize(),
+        }
+
+    # ---------------------------------------------------------------
+    # Worker side
+    # ---------------------------------------------------------------
+    def _collect(self) -> Tuple[List[_Request], bool]:
+        """Block for one request, then gather more until the window closes."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        size = len(first.prompts)
+        deadline = time.monotonic() + self.batch_window
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                req = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if req is None:
+                return batch, True
+            batch.append(req)
+            size += len(req.prompts)
+        return batch, False
+
+    def _run_job(self, req: _Request) -> None:
+        future = req.futures[0]
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with self.model_lock:
+                result = req.job()
+        except Exception as e:
+            future.set_exception(e)
+            return
+        future.set_result(result)
+
+    def _run_group(self, req: _Request, items: List[Tuple[str, Future]]) -> None:
+        try:
+            with self.model_lock:
+                outputs = generate_batch(
+                    self.model,
+                    self.tokenizer,
+                    [prompt for prompt, _ in items],
+                    max_new_tokens=req.max_new_tokens,
+                    max_batch_tokens=self.max_batch_tokens,
+                    max_batch_size=self.max_batch_size,
+                    **req.gen_kwargs
+                )
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+        for (_, future), out in zip(items, outputs):
+            future.set_result(out)
+
+    def _loop(self) -> None:
+        while True:
+            batch, stop = self._collect()
+
+            # Prompts of every request with the same settings go to one generate_batch,
+            # which buckets them by length
+            groups: Dict[Tuple, Tuple[_Request, List[Tuple[str, Future]]]] = {}
+            for req in batch:
+                if req.job is not None:
+                    self._run_job(req)
+                    continue
+                items = groups.setdefault(req.key, (req, []))[1]
+                items.extend((p, f) for p, f in zip(req.prompts, req.futures) if f.set_running_or_notify_cancel())
+            for req, items in groups.values():
+                if not items:
+                    continue
+                self.requests += len(items)
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(items))
+                self._run_group(req, items)
+
+            if stop:
+                return
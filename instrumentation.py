@@ -0,0 +1,228 @@
+"""
+instrumentation.py
+------------------
+Lightweight per-stage timing and memory instrumentation for ClauseWise.
+
+Wrap a stage with the `instrumented` decorator or the `measure` context
+manager and every call is recorded with wall time, CPU time, an optional
+token count and (when allocation tracing is on) the tracemalloc allocation
+delta and peak:
+
+    @instrumented("split_into_clauses")
+    def split_into_clauses(text): ...
+
+    with measure("generation", model=MODEL_ID) as m:
+        ...
+        m.tokens = stream.token_count
+
+Records go to a bounded in-memory ring (`recorder`) that the Streamlit apps
+show in a hidden diagnostics panel, and can be exported as JSON lines. Set
+CLAUSEWISE_METRICS_FILE to also append every record to a JSONL file.
+
+Environment:
+    CLAUSEWISE_INSTRUMENT=0        turn recording off (the wrappers become no-ops)
+    CLAUSEWISE_TRACE_ALLOC=1       start tracemalloc and record allocation deltas
+    CLAUSEWISE_METRICS_FILE=path   append every record to this JSONL file
+    CLAUSEWISE_METRICS_MAX=5000    records kept in memory
+
+CPU time is process CPU (time.process_time), so it includes model threads
+started by the stage; with several sessions running at once it also picks
+up their work.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+ENABLED = os.environ.get("CLAUSEWISE_INSTRUMENT", "1") != "0"
+TRACE_ALLOC = os.environ.get("CLAUSEWISE_TRACE_ALLOC", "0") == "1"
+METRICS_FILE = os.environ.get("CLAUSEWISE_METRICS_FILE") or None
+MAX_RECORDS = int(os.environ.get("CLAUSEWISE_METRICS_MAX", "5000"))
+
+_local = threading.local()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+class Recorder:
+    """Thread-safe ring buffer of stage records, with an optional JSONL sink."""
+
+    def __init__(self, max_records: int = MAX_RECORDS, sink_path: Optional[str] = METRICS_FILE):
+        self._records: "deque[Dict[str, Any]]" = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self.sink_path = sink_path
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records.append(record)
+            if self.sink_path:
+                with open(self.sink_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+    def records(self, stage: Optional[str] = None, session: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            out = list(self._records)
+        if stage is not None:
+            out = [r for r in out if r["stage"] == stage]
+        if session is not None:
+            out = [r for r in out if r.get("session") == session]
+        return out
+
+    def clear(self, session: Optional[str] = None) -> None:
+        """Drop all records, or only those tagged with `session`."""
+        with self._lock:
+            if session is None:
+                self._records.clear()
+            else:
+                kept = [r for r in self._records if r.get("session") != session]
+                self._records.clear()
+                self._records.extend(kept)
+
+    def summary(self, records: Optional[Iterable[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Per-stage aggregates, slowest total wall time first."""
+        by_stage: Dict[str, List[Dict[str, Any]]] = {}
+        for r in self.records() if records is None else records:
+            by_stage.setdefault(r["stage"], []).append(r)
+
+        rows = []
+        for stage, recs in by_stage.items():
+            walls = [r["wall_s"] for r in recs]
+            tokens = sum(r.get("tokens") or 0 for r in recs)
+            row = {
+                "stage": stage,
+                "calls": len(recs),
+                "errors": sum(1 for r in recs if r.get("error")),
+                "total_s": round(sum(walls), 4),
+                "p50_ms": round(_percentile(walls, 50) * 1000, 2),
+                "p90_ms": round(_percentile(walls, 90) * 1000, 2),
+                "max_ms": round(max(walls) * 1000, 2),
+                "cpu_s": round(sum(r.get("cpu_s") or 0.0 for r in recs), 4),
+                "tokens": tokens,
+                "tokens_per_s": round(tokens / sum(walls), 2) if tokens and sum(walls) > 0 else None,
+            }
+            peaks = [r["alloc_peak_kb"] for r in recs if "alloc_peak_kb" in r]
+            if peaks:
+                row["alloc_peak_kb"] = max(peaks)
+            rows.append(row)
+        rows.sort(key=lambda r: r["total_s"], reverse=True)
+        return rows
+
+    def to_jsonl(self, records: Optional[Iterable[Dict[str, Any]]] = None) -> str:
+        return "".join(json.dumps(r, default=str) + "\n" for r in (self.records() if records is None else records))
+
+    def export_jsonl(self, path: str) -> int:
+        records = self.records()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_jsonl(records))
+        return len(records)
+
+
+recorder = Recorder()
+
+
+# -------------------------------------------------------------------
+# ⏱️ Measuring
+# -------------------------------------------------------------------
+def set_session(session_id: Optional[str]) -> None:
+    """Tag records made on this thread with a session id (one Streamlit session per script run)."""
+    _local.session = session_id
+
+
+def start_alloc_tracing(frames: int = 1) -> None:
+    global TRACE_ALLOC
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    TRACE_ALLOC = True
+
+
+class measure:
+    """
+    Context manager recording one call of `stage`. Set `.tokens` (or any key
+    of `.meta`) inside the block to attach counts to the record.
+    """
+
+    def __init__(self, stage: str, **meta: Any):
+        self.stage = stage
+        self.meta = meta
+        self.tokens: Optional[int] = None
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self._trace = False
+
+    def __enter__(self) -> "measure":
+        if not ENABLED:
+            return self
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        self._trace = TRACE_ALLOC and tracemalloc.is_tracing()
+        if self._trace:
+            if depth == 0:
+                # Peak is the high-water mark since the outermost measure began
+                tracemalloc.reset_peak()
+            self._alloc_start = tracemalloc.get_traced_memory()[0]
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if not ENABLED:
+            return False
+        self.wall_s = time.perf_counter() - self._wall
+        self.cpu_s = time.process_time() - self._cpu
+        _local.depth = getattr(_local, "depth", 1) - 1
+
+        record: Dict[str, Any] = {
+            "ts": round(time.time(), 3),
+            "stage": self.stage,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "thread": threading.current_thread().name,
+        }
+        session = getattr(_local, "session", None)
+        if session is not None:
+            record["session"] = session
+        if self.tokens is not None:
+            record["tokens"] = self.tokens
+        if self._trace:
+            current, peak = tracemalloc.get_traced_memory()
+            record["alloc_delta_kb"] = round((current - self._alloc_start) / 1024, 1)
+            record["alloc_peak_kb"] = round((peak - self._alloc_start) / 1024, 1)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.meta)
+        recorder.add(record)
+        return False
+
+
+def instrumented(stage: Optional[str] = None, tokens: Optional[Callable[[Any], int]] = None):
+    """
+    Decorator form of `measure`. `tokens`, if given, maps the return value
+    to a token count for the record.
+    """
+    def wrap(fn):
+        name = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with measure(name) as m:
+                result = fn(*args, **kwargs)
+                if tokens is not None:
+                    m.tokens = tokens(result)
+                return result
+        return inner
+    return wrap
+
+
+if TRACE_ALLOC:
+    start_alloc_tracing()
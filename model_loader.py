@@ -0,0 +1,144 @@
+"""
+model_loader.py
+---------------
+Deferred, background model loading for the ClauseWise UIs.
+
+A BackgroundLoader runs an expensive load function (LLM, spaCy) once on a
+daemon thread, so the Streamlit script can render the upload widget and the
+non-LLM tabs immediately and only wait for the model when a feature needs
+it. The load function must not call Streamlit: it runs outside the script
+thread. Errors are kept on the loader and reported by the UI.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# Start loading in the background right after the first render instead of
+# waiting for the first feature that needs the model
+PRELOAD_MODELS = os.environ.get("CLAUSEWISE_PRELOAD_MODELS", "1") == "1"
+
+# CPU inference mode: "fp32" or "int8" (dynamic int8 quantization of nn.Linear)
+QUANT_MODE = os.environ.get("CLAUSEWISE_QUANT", "fp32").lower()
+# torch intra-op threads; 0 keeps torch's default
+CPU_THREADS = int(os.environ.get("CLAUSEWISE_NUM_THREADS", "0"))
+
+
+class BackgroundLoader:
+    """
+    Load something once, on a background thread, on first request.
+    """
+
+    def __init__(self, name: str, load_fn: Callable[[], Any]):
+        self.name = name
+        self._load_fn = load_fn
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> "BackgroundLoader":
+        with self._lock:
+            if self._thread is None:
+                self.started_at = time.time()
+                self._thread = threading.Thread(target=self._run, name=f"load-{self.name}", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            self.result = self._load_fn()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self.error is None
+
+    @property
+    def status(self) -> str:
+        if self._thread is None:
+            return "not started"
+        if not self._done.is_set():
+            return "loading"
+        return "failed" if self.error is not None else "ready"
+
+    def get(self) -> Any:
+        """The loaded object if ready, else None (never blocks)."""
+        return self.result if self.ready else None
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Start loading if needed and block until done; None on failure/timeout."""
+        self.start()
+        self._done.wait(timeout)
+        return self.get()
+
+    def describe(self) -> str:
+        status = self.status
+        if status == "ready":
+            return f"✅ {self.name} ready (loaded in {self.finished_at - self.started_at:.0f}s)"
+        if status == "loading":
+            return f"⏳ {self.name} loading... ({time.time() - self.started_at:.0f}s)"
+        if status == "failed":
+            return f"❌ {self.name} failed to load: {self.error}"
+        return f"💤 {self.name} loads on first use"
+
+
+# -------------------------------------------------------------------
+# 🧮 CPU inference modes
+# -------------------------------------------------------------------
+def configure_cpu_threads(num_threads: int = CPU_THREADS) -> int:
+    import torch
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
+
+
+def quantize_dynamic_int8(model):
+    """
+    Dynamic int8 quantization of every nn.Linear: weights are stored as int8
+    and activations are quantized on the fly. CPU only.
+    """
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_causal_lm(model_id: str, device: str = "cpu", dtype=None, quant: str = QUANT_MODE,
+                   num_threads: int = CPU_THREADS):
+    """
+    Load tokenizer and causal LM. On CPU, quant="int8" applies dynamic
+    quantization after loading the fp32 weights.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    if quant not in ("fp32", "int8"):
+        raise ValueError(f"Unknown CLAUSEWISE_QUANT mode: {quant!r} (expected 'fp32' or 'int8')")
+    if device == "cpu":
+        configure_cpu_threads(num_threads)
+        if quant == "int8":
+            dtype = torch.float32   # quantize_dynamic expects fp32 weights
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id, use_fast=True)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_id,
+        torch_dtype=dtype,
+        device_map="auto" if device == "cuda" else None,
+        low_cpu_mem_usage=True,
+        trust_remote_code=True
+    )
+    if device != "cuda":
+        model.to(device)
+    if device == "cpu" and quant == "int8":
+        model = quantize_dynamic_int8(model)
+    model.eval()
+    return tokenizer, model
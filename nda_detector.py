@@ -0,0 +1,99 @@
+"""
+nda_detector.py
+---------------
+Early-exit NDA detection for ClauseWise uploads.
+
+All NDA keywords are compiled into one matcher (the Aho-Corasick engine in
+risk_matcher) and only the first NDA_SCAN_PAGES pages / NDA_SCAN_CHARS
+characters are scanned, chunk by chunk as they stream out of extraction.
+The detector answers as soon as it is sure, so non-NDA uploads are
+rejected without parsing the rest of the document.
+"""
+
+from typing import List, Optional
+
+from risk_matcher import RiskMatch, RiskMatcher
+
+NDA_KEYWORDS = [
+    "non-disclosure", "non disclosure", "nda",
+    "confidential information", "disclosing party",
+    "receiving party", "confidentiality",
+    "confidential materials", "protected information"
+]
+
+NDA_MIN_CHARS = 50
+NDA_SCAN_CHARS = 20000
+NDA_SCAN_PAGES = 5
+
+_nda_matcher: Optional[RiskMatcher] = None
+
+
+def _get_matcher() -> RiskMatcher:
+    global _nda_matcher
+    if _nda_matcher is None:
+        _nda_matcher = RiskMatcher({"nda": NDA_KEYWORDS})
+    return _nda_matcher
+
+
+class NdaDetector:
+    """
+    Incremental NDA check. feed()/feed_page() return True or False once the
+    answer is known and None while more text is needed.
+
+    A document is an NDA when an NDA keyword appears in the scanned prefix
+    and the document has at least NDA_MIN_CHARS characters.
+    """
+
+    def __init__(self, max_chars: int = NDA_SCAN_CHARS, max_pages: int = NDA_SCAN_PAGES,
+                 min_chars: int = NDA_MIN_CHARS):
+        self.max_chars = max_chars
+        self.max_pages = max_pages
+        self.min_chars = min_chars
+        self.hits: List[RiskMatch] = []
+        self.total_chars = 0
+        self.scanned_chars = 0
+        self.pages_seen = 0
+        self.decision: Optional[bool] = None
+        self._state = 0
+
+    def _scan(self, text: str) -> None:
+        budget = self.max_chars - self.scanned_chars
+        if budget > 0:
+            chunk = text[:budget]
+            hits, self._state = _get_matcher().scan_chunk(chunk, self._state, self.scanned_chars)
+            self.hits.extend(hits)
+            self.scanned_chars += len(chunk)
+        self.total_chars += len(text)
+
+    def feed(self, text: str) -> Optional[bool]:
+        if self.decision is None:
+            self._scan(text)
+        return self._decide()
+
+    def feed_page(self, text: str) -> Optional[bool]:
+        if self.decision is None:
+            self._scan("\n" + text if self.pages_seen else text)
+            self.pages_seen += 1
+        return self._decide()
+
+    def _decide(self) -> Optional[bool]:
+        if self.decision is not None:
+            return self.decision
+        if self.hits and self.total_chars >= self.min_chars:
+            self.decision = True
+        elif not self.hits and (self.scanned_chars >= self.max_chars or
+                                (self.max_pages and self.pages_seen >= self.max_pages)):
+            self.decision = False
+        return self.decision
+
+    def finish(self) -> bool:
+        """Final answer once the whole (short) document has been fed."""
+        if self.decision is None:
+            self.decision = bool(self.hits) and self.total_chars >= self.min_chars
+        return self.decision
+
+
+def is_nda_text(text: str) -> bool:
+    detector = NdaDetector()
+    detector.feed(text)
+    return detector.finish()
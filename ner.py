@@ -0,0 +1,129 @@
+"""
+ner.py
+------
+Chunked, multi-process spaCy NER for ClauseWise.
+
+Long documents are split on clause boundaries into chunks well below
+spaCy's max_length, run through nlp.pipe with only the components NER
+needs, and the entity offsets are mapped back into document coordinates.
+Nothing is truncated, and large documents use several processes.
+"""
+
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from instrumentation import instrumented
+from segmentation import segment
+
+NER_CHUNK_CHARS = int(os.environ.get("CLAUSEWISE_NER_CHUNK_CHARS", "100000"))
+NER_BATCH_SIZE = int(os.environ.get("CLAUSEWISE_NER_BATCH_SIZE", "8"))
+NER_PROCESSES = int(os.environ.get("CLAUSEWISE_NER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Below this size the cost of starting worker processes outweighs the gain
+NER_PARALLEL_MIN_CHARS = 300000
+
+# Components the NER model depends on; everything else is switched off
+NER_COMPONENTS = ("tok2vec", "ner")
+
+# Blank lines, numbered/bulleted lines and sentence ends, in order of preference
+_BOUNDARY_PATTERNS = [
+    re.compile(r"\n\s*\n"),
+    re.compile(r"\n(?=\s*(?:\d+(?:\.\d+)*[.)]|\([a-z0-9]+\)|[•\-*])\s)"),
+    re.compile(r"(?<=[.;!?])\s+"),
+    re.compile(r"\s+"),
+]
+
+
+class Entity(NamedTuple):
+    label: str
+    text: str
+    start: int
+    end: int
+
+
+def _best_cut(text: str, start: int, limit: int) -> int:
+    """Latest clause-like boundary in text[start:limit], or limit if none."""
+    window = text[start:limit]
+    for pattern in _BOUNDARY_PATTERNS:
+        last = None
+        for m in pattern.finditer(window):
+            last = m
+        if last is not None and last.end() > 0:
+            return start + last.end()
+    return limit
+
+
+def chunk_text(text: str, max_chars: int = NER_CHUNK_CHARS) -> List[Tuple[str, int]]:
+    """
+    Split `text` into (chunk, offset) pieces of at most `max_chars`, cutting
+    at clause boundaries where possible so no entity is split in two.
+    """
+    chunks = []
+    start = 0
+    n = len(text)
+    while start < n:
+        limit = min(n, start + max_chars)
+        end = limit if limit == n else _best_cut(text, start, limit)
+        chunks.append((text[start:end], start))
+        start = end
+    return chunks
+
+
+@instrumented("ner")
+def extract_entities(nlp, text: str, n_process: Optional[int] = None,
+                     batch_size: int = NER_BATCH_SIZE, chunk_chars: int = NER_CHUNK_CHARS) -> List[Entity]:
+    """All entities in `text`, with offsets in document coordinates."""
+    if not text:
+        return []
+
+    chunks = chunk_text(text, chunk_chars)
+    if n_process is None:
+        n_process = NER_PROCESSES if len(text) >= NER_PARALLEL_MIN_CHARS else 1
+    n_process = max(1, min(n_process, len(chunks)))
+    disable = [name for name in nlp.pipe_names if name not in NER_COMPONENTS]
+
+    entities: List[Entity] = []
+    docs = nlp.pipe(chunks, as_tuples=True, n_process=n_process, batch_size=batch_size, disable=disable)
+    for doc, offset in docs:
+        for ent in doc.ents:
+            entities.append(Entity(ent.label_, ent.text, offset + ent.start_char, offset + ent.end_char))
+    return entities
+
+
+def ner_pieces(text: str) -> List[str]:
+    """
+    Every segment of `text` (headings and short lines too), so per-piece
+    NER covers the same text as whole-document NER.
+    """
+    return [node.text for node in segment(text).nodes if node.text]
+
+
+@instrumented("ner.clauses")
+def entities_per_text(nlp, texts: List[str], n_process: Optional[int] = None,
+                      batch_size: int = NER_BATCH_SIZE, chunk_chars: int = NER_CHUNK_CHARS) -> List[List[Entity]]:
+    """
+    Entities of each text on its own (offsets relative to that text), from
+    one nlp.pipe over all of them. Used for per-clause NER so that unchanged
+    clauses of a revised document can reuse their results. Texts longer
+    than `chunk_chars` are chunked like extract_entities and merged back.
+    """
+    if not texts:
+        return []
+    pieces = [(chunk, (i, offset)) for i, text in enumerate(texts) for chunk, offset in chunk_text(text, chunk_chars)]
+    if n_process is None:
+        n_process = NER_PROCESSES if sum(map(len, texts)) >= NER_PARALLEL_MIN_CHARS else 1
+    n_process = max(1, min(n_process, len(pieces) or 1))
+    disable = [name for name in nlp.pipe_names if name not in NER_COMPONENTS]
+
+    out: List[List[Entity]] = [[] for _ in texts]
+    docs = nlp.pipe(pieces, as_tuples=True, n_process=n_process, batch_size=batch_size, disable=disable)
+    for doc, (i, offset) in docs:
+        out[i].extend(Entity(ent.label_, ent.text, offset + ent.start_char, offset + ent.end_char) for ent in doc.ents)
+    return out
+
+
+def group_entities(entities: List[Entity]) -> Dict[str, List[str]]:
+    out: Dict[str, set] = {}
+    for ent in entities:
+        out.setdefault(ent.label, set()).add(ent.text)
+    return {k: sorted(v) for k, v in out.items()}
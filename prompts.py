@@ -0,0 +1,52 @@
+"""
+prompts.py
+----------
+LLM prompts for ClauseWise.
+
+Kept free of Streamlit and torch imports so benchmarks and scripts send
+exactly the prompts the app sends.
+"""
+
+from doc_classifier import DOC_TYPES
+
+SIMPLIFY_SYSTEM_PROMPT = """You are a legal assistant that rewrites complex legal clauses into plain, understandable English. 
+    Be concise and focus on the main points. Keep responses under 200 words."""
+
+CLASSIFY_SYSTEM_PROMPT = """You are a legal document classification expert. Analyze the provided text and determine the most appropriate document type from the given list."""
+
+
+def chat_prompt(tokenizer, system_prompt: str, user_prompt: str) -> str:
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": user_prompt})
+    try:
+        return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    except Exception:
+        sys = f"<|system|>\n{system_prompt}\n" if system_prompt else ""
+        usr = f"<|user|>\n{user_prompt}\n<|assistant|>\n"
+        return sys + usr
+
+
+def build_simplify_prompt(clause: str) -> str:
+    # Limit clause length for faster processing
+    processed_clause = clause[:1500]  # Process only first 1500 chars
+
+    return f"""Rewrite this legal clause in simple English. Focus on the key obligations and rights:
+
+{processed_clause}
+
+Provide a clear, simple explanation:"""
+
+
+def build_classify_prompt(text: str) -> str:
+    labels = "\n".join(f"- {t}" for t in DOC_TYPES)
+    return f"""Classify the following legal document into one of these types:
+
+Available types:
+{labels}
+
+Document text (first 3000 characters):
+{text[:3000]}
+
+Provide only the most appropriate document type from the list above."""
@@ -0,0 +1,169 @@
+"""
+response_cache.py
+-----------------
+Persistent LLM response cache for ClauseWise.
+
+Boilerplate clauses ("Confidentiality obligations survive termination.")
+repeat across hundreds of NDAs. Responses are stored in one SQLite file,
+keyed by a SHA-256 of the normalised prompt, the model id and the
+generation parameters, so they survive restarts and are shared by every
+process on the machine. When the file grows past its byte budget, the
+least recently used responses are evicted.
+
+Only deterministic calls are cached: greedy decoding, which the app uses
+when CLAUSEWISE_LLM_DETERMINISTIC=1, and label rankings. A sampled
+response is one draw out of many, and replaying it would hide that.
+
+    cache = ResponseCache("/tmp/responses.sqlite")
+    text = cache.get_or_generate(prompt, MODEL_ID, params, lambda: generate(prompt))
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+RESPONSE_CACHE_MB = float(os.environ.get("CLAUSEWISE_RESPONSE_CACHE_MB", "64"))
+
+_SPACES = re.compile(r"[ \t]+")
+
+
+def default_cache_path() -> str:
+    if os.environ.get("CLAUSEWISE_RESPONSE_CACHE"):
+        return os.environ["CLAUSEWISE_RESPONSE_CACHE"]
+    base = os.environ.get("CLAUSEWISE_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "clausewise")
+    return os.path.join(base, "responses.sqlite")
+
+
+# -------------------------------------------------------------------
+# 🔑 Keys
+# -------------------------------------------------------------------
+def normalize_prompt(prompt: str) -> str:
+    """Same key for prompts that differ only in line endings or runs of spaces."""
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(_SPACES.sub(" ", line).strip() for line in lines).strip()
+
+
+def is_deterministic(params: Dict[str, Any]) -> bool:
+    """Greedy (or beam) decoding gives the same output for the same prompt."""
+    return not params.get("do_sample", False)
+
+
+def response_key(prompt: str, model_id: str, params: Dict[str, Any]) -> str:
+    blob = json.dumps(
+        {"prompt": normalize_prompt(prompt), "model": model_id, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------
+# 🗄️ SQLite store
+# -------------------------------------------------------------------
+class ResponseCache:
+    """
+    Size-bounded, LRU-evicted SQLite store of LLM responses.
+    One instance is safe to share between threads. Several processes may
+    open the same file (WAL mode).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or default_cache_path()
+        self.max_bytes = int(RESPONSE_CACHE_MB * 1024 * 1024) if max_bytes is None else int(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock, self._db:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, model_id: str = "") -> None:
+        size = len(key) + len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_id, response, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Other processes write to the same file: start from the real total
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)     # leave headroom so every put doesn't evict
+        while self._size > target:
+            rows = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                if self._size <= target:
+                    break
+                victims.append(key)
+                self._size -= size
+            self._db.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in victims])
+            self.evictions += len(victims)
+
+    def get_or_generate(self, prompt: str, model_id: str, params: Dict[str, Any],
+                        generate: Callable[[], str]) -> str:
+        """Cached response for deterministic `params`; sampled calls always run `generate`."""
+        if not is_deterministic(params):
+            return generate()
+        key = response_key(prompt, model_id, params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        response = generate()
+        if response:
+            self.put(key, response, model_id)
+        return response
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "entries": entries,
+                "size_kb": round(self._size / 1024, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,180 @@
+"""
+risk_matcher.py
+---------------
+Single-pass risk keyword matching for ClauseWise.
+
+All risk keywords (the built-in RISK_PATTERNS plus the keyword rules for
+the legal_kb.json risk list) are compiled into one Aho-Corasick automaton.
+A document is scanned once, in time linear in its length regardless of how
+many rules there are, and every hit is reported with its label and span.
+"""
+
+import json
+import os
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+KB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "legal_kb.json")
+
+# Simple risk detector rules (label -> lowercase keywords)
+RISK_PATTERNS = {
+    "Broad confidentiality definition": ["broad", "all information", "any information"],
+    "Unlimited liability": ["unlimited", "full liability", "all damages"],
+    "One-sided obligations": ["shall not", "only the receiving party"],
+    "Long duration (>5 years)": ["5 years", "7 years", "perpetual"],
+    "No termination rights": ["cannot terminate", "no termination"]
+}
+
+# Clause separator for scan_clauses; never part of a keyword
+_SEPARATOR = "\x00"
+
+
+class RiskMatch(NamedTuple):
+    label: str
+    keyword: str
+    start: int
+    end: int
+
+
+# -------------------------------------------------------------------
+# 📚 Rule loading
+# -------------------------------------------------------------------
+def load_kb_rules(path: str = KB_PATH, doc_type: str = "nda") -> Dict[str, List[str]]:
+    """
+    Keyword rules for the risk list in legal_kb.json. Risks without a
+    `risk_keywords` entry fall back to matching their own description.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            kb = json.load(f).get(doc_type, {})
+    except (OSError, ValueError):
+        return {}
+    keywords = kb.get("risk_keywords", {})
+    return {risk: keywords.get(risk, [risk.lower()]) for risk in kb.get("risks", [])}
+
+
+def default_rules() -> Dict[str, List[str]]:
+    rules = {label: list(kws) for label, kws in RISK_PATTERNS.items()}
+    for label, kws in load_kb_rules().items():
+        rules.setdefault(label, []).extend(kws)
+    return rules
+
+
+# -------------------------------------------------------------------
+# 🔎 Aho-Corasick automaton
+# -------------------------------------------------------------------
+class RiskMatcher:
+    """
+    Aho-Corasick automaton over lowercase keywords.
+
+    `rules` maps a risk label to its keywords; labels keep their insertion
+    order, which is also the order used by `labels_for_clauses`.
+    """
+
+    def __init__(self, rules: Dict[str, Iterable[str]]):
+        self.labels: List[str] = list(rules)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # state -> [(label index, keyword)] for every keyword ending there
+        self._out: List[List[tuple]] = [[]]
+
+        for label_idx, label in enumerate(self.labels):
+            for kw in rules[label]:
+                kw = kw.lower()
+                if kw:
+                    self._add(kw, label_idx)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, label_idx: int) -> None:
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((label_idx, keyword))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+
+    def scan(self, text: str) -> List[RiskMatch]:
+        """All (possibly overlapping) keyword hits in `text`, in end-offset order."""
+        return self.scan_chunk(text)[0]
+
+    def scan_chunk(self, text: str, state: int = 0, offset: int = 0) -> Tuple[List[RiskMatch], int]:
+        """
+        Scan one chunk of a longer stream. Pass the returned state (and the
+        running offset) into the next call so keywords spanning chunk
+        boundaries are still found.
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters change length when lowercased; keep offsets aligned
+            lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+        goto, fail, out, labels = self._goto, self._fail, self._out, self.labels
+        hits: List[RiskMatch] = []
+        for i, ch in enumerate(lowered, offset):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for label_idx, kw in out[state]:
+                    hits.append(RiskMatch(labels[label_idx], kw, i - len(kw) + 1, i + 1))
+        return hits, state
+
+    def scan_clauses(self, clauses: Sequence[str]) -> List[List[RiskMatch]]:
+        """
+        Scan all clauses in one pass; returns hits per clause with spans
+        relative to that clause.
+        """
+        starts = []
+        pos = 0
+        for clause in clauses:
+            starts.append(pos)
+            pos += len(clause) + len(_SEPARATOR)
+
+        per_clause: List[List[RiskMatch]] = [[] for _ in clauses]
+        for hit in self.scan(_SEPARATOR.join(clauses)):
+            idx = bisect_right(starts, hit.start) - 1
+            base = starts[idx]
+            per_clause[idx].append(hit._replace(start=hit.start - base, end=hit.end - base))
+        return per_clause
+
+    def labels_for_clauses(self, clauses: Sequence[str], limit: Optional[int] = None) -> List[str]:
+        """
+        Distinct labels in clause order (rule order within a clause), like
+        the original per-clause keyword loop.
+        """
+        order = {label: i for i, label in enumerate(self.labels)}
+        found: Dict[str, None] = {}
+        for hits in self.scan_clauses(clauses):
+            for label in sorted({h.label for h in hits}, key=order.get):
+                found.setdefault(label, None)
+        labels = list(found)
+        return labels[:limit] if limit is not None else labels
+
+
+_default_matcher: Optional[RiskMatcher] = None
+
+
+def get_default_matcher() -> RiskMatcher:
+    """Process-wide matcher over RISK_PATTERNS and the legal_kb.json risks."""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = RiskMatcher(default_rules())
+    return _default_matcher
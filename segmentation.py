@@ -0,0 +1,305 @@
+"""
+segmentation.py
+---------------
+Single-pass clause segmentation for ClauseWise.
+
+The text is scanned once, line by line. A line that starts with a marker
+opens a new clause:
+
+    ARTICLE IV / Section 5.    article headings
+    1.  2)  1.1  4.2.3         decimal numbering (depth = number of parts)
+    (a)  a.  (i)  iv)  (A)     lettered and roman items
+    -  *  •                    bullets
+
+Unmarked all-caps lines are headings, and unmarked text after a blank line
+under a heading starts a new paragraph. Any other line continues the
+current clause (PDF text wraps long clauses over several lines).
+
+Nesting is adaptive: a marker of a style already open on the stack closes
+everything below it and becomes a sibling; a new style opens a child. This
+gives the usual 1 > 1.1 > (a) > (i) tree without hard-coding an order.
+Every node keeps its character offsets in the original text.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+_MARKER = re.compile(
+    r"""[ \t]*(?:
+        (?P<article>(?:ARTICLE|SECTION)\s+(?:\d{1,3}|[IVXLC]{1,7})
+                   |(?:Article|Section)\s+(?:\d{1,3}|[IVXLC]{1,7})(?=[.:]|[ \t]*$))[.:]?(?:[ \t]+|$)
+      | (?P<multi>\d{1,3}(?:\.\d{1,3})+)\.?(?:[ \t]+|$)
+      | (?P<num>\d{1,3})[.)](?:[ \t]+|$)
+      | \((?P<paren>[A-Za-z]{1,5}|\d{1,3})\)[ \t]+
+      | (?P<alpha>[A-Za-z]{1,4})[.)][ \t]+
+      | (?P<bullet>[•◦▪·*–-])[ \t]+
+    )""",
+    re.VERBOSE,
+)
+_ROMAN = re.compile(r"(?i)^(?=[ivxlc])c{0,3}(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})$")
+_ROMAN_DIGITS = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100}
+_SENTENCE_SPLIT = re.compile(r"(?<=[.;!?])\s+(?=[A-Z])")
+
+HEADING_MAX_CHARS = 80
+
+
+class Clause:
+    """One node of the clause tree. Offsets index into the segmented text."""
+
+    __slots__ = ("kind", "label", "start", "body_start", "end", "span_end",
+                 "is_heading", "parent", "children", "_doc")
+
+    def __init__(self, doc: str, kind: str, label: str, start: int, body_start: int,
+                 is_heading: bool, parent: Optional["Clause"]):
+        self._doc = doc
+        self.kind = kind            # "dec1", "paren_alpha", "bullet", "heading", "para", ...
+        self.label = label          # "1.2", "a", "iv", "" for unmarked nodes
+        self.start = start          # line start (marker included)
+        self.body_start = body_start
+        self.end = start            # end of this node's own text (next node's start)
+        self.span_end = start       # end including all descendants
+        self.is_heading = is_heading
+        self.parent = parent
+        self.children: List["Clause"] = []
+
+    @property
+    def level(self) -> int:
+        depth, node = 0, self.parent
+        while node is not None:
+            depth, node = depth + 1, node.parent
+        return depth
+
+    @property
+    def text(self) -> str:
+        """Own text without the marker, stripped."""
+        return self._doc[self.body_start:self.end].strip()
+
+    @property
+    def text_start(self) -> int:
+        """Offset of the first character of `text`."""
+        body = self._doc[self.body_start:self.end]
+        return self.body_start + (len(body) - len(body.lstrip()))
+
+    @property
+    def number(self) -> str:
+        """Hierarchical number such as "2.1(a)(iii)" (empty for unnumbered nodes)."""
+        parts, node = [], self
+        while node is not None:
+            if node.kind.startswith("dec"):
+                parts.append(node.label)
+                break   # "2.1" already carries its own ancestry
+            if node.label and node.kind not in ("bullet", "article"):
+                parts.append(f"({node.label})")
+            node = node.parent
+        return "".join(reversed(parts))
+
+    def full_text(self) -> str:
+        """Text of this node and all of its descendants."""
+        return self._doc[self.body_start:self.span_end].strip()
+
+    def __repr__(self) -> str:
+        return f"Clause({self.kind}, {self.label!r}, {self.start}-{self.end}, {len(self.children)} children)"
+
+
+class ClauseTree:
+    def __init__(self, text: str, nodes: List[Clause], roots: List[Clause]):
+        self.text = text
+        self.nodes = nodes      # document order
+        self.roots = roots
+
+    def clauses(self, min_len: int = 20) -> List[Clause]:
+        """
+        Non-heading nodes whose own text is at least `min_len` characters.
+        Text without any structure falls back to one node per sentence.
+        """
+        found = [n for n in self.nodes if not n.is_heading and len(n.text) >= min_len]
+        return found if len(found) >= 2 else _sentence_nodes(self.text, min_len)
+
+    def headings(self) -> List[Clause]:
+        return [n for n in self.nodes if n.is_heading]
+
+    def outline(self) -> List[Dict]:
+        return [_outline(n) for n in self.roots]
+
+
+def _sentence_nodes(text: str, min_len: int) -> List[Clause]:
+    nodes, start = [], 0
+    for end, next_start in [(m.start(), m.end()) for m in _SENTENCE_SPLIT.finditer(text)] + [(len(text), None)]:
+        node = Clause(text, "sentence", "", start, start, False, None)
+        node.end = node.span_end = end
+        if len(node.text) >= min_len:
+            nodes.append(node)
+        start = next_start
+    return nodes
+
+
+def _outline(node: Clause) -> Dict:
+    return {
+        "kind": node.kind,
+        "label": node.label,
+        "start": node.start,
+        "end": node.span_end,
+        "heading": node.is_heading,
+        "children": [_outline(c) for c in node.children],
+    }
+
+
+def _is_heading_text(line: str) -> bool:
+    # A trailing parenthetical may be mixed case: "NON-DISCLOSURE AGREEMENT (Sample)"
+    core = line.split("(", 1)[0].rstrip() or line
+    return (
+        3 <= len(line) <= HEADING_MAX_CHARS
+        and core.upper() == core
+        and any(ch.isalpha() for ch in core)
+        and line[-1] not in ".;,"
+    )
+
+
+def _roman_value(value: str) -> int:
+    total, prev = 0, 0
+    for ch in reversed(value.lower()):
+        v = _ROMAN_DIGITS[ch]
+        total += -v if v < prev else v
+        prev = max(prev, v)
+    return total
+
+
+def _lettered_kind(value: str, style: str, stack: List[Clause]) -> str:
+    """Tell (i)/(v)/(x) roman items from the 9th/22nd/24th lettered item."""
+    upper = value.isupper()
+    alpha_kind = f"{style}_{'upper' if upper else 'alpha'}"
+    roman_kind = f"{style}_{'Roman' if upper else 'roman'}"
+    if len(value) > 1 or value.lower() not in _ROMAN_DIGITS:
+        return roman_kind if len(value) > 1 and _ROMAN.match(value) else alpha_kind
+    # Single letter that is also a roman numeral: continue whichever list it extends
+    for node in reversed(stack):
+        # Multi-letter labels such as "(Note)" share the kind but have no successor
+        if node.kind == alpha_kind and len(node.label) == 1 and ord(node.label) + 1 == ord(value):
+            return alpha_kind
+        if node.kind == roman_kind and _roman_value(node.label) + 1 == _roman_value(value):
+            return roman_kind
+    return roman_kind if value.lower() == "i" else alpha_kind
+
+
+def _classify(m: "re.Match", stack: List[Clause]):
+    if m.group("article"):
+        return "article", m.group("article").split()[-1]
+    if m.group("multi"):
+        label = m.group("multi")
+        return f"dec{label.count('.') + 1}", label
+    if m.group("num"):
+        return "dec1", m.group("num")
+    if m.group("paren"):
+        value = m.group("paren")
+        if value.isdigit():
+            return "paren_num", value
+        return _lettered_kind(value, "paren", stack), value
+    if m.group("alpha"):
+        value = m.group("alpha")
+        kind = _lettered_kind(value, "dot", stack)
+        # "Re." / "No." style words are not item markers; only single letters or romans
+        if len(value) > 1 and not kind.endswith(("roman", "Roman")):
+            return None
+        return kind, value
+    return "bullet", m.group("bullet")
+
+
+def _attach_depth(stack: List[Clause], kind: str) -> int:
+    """How much of the open stack a new `kind` node keeps (its parent is the last kept node)."""
+    dec_depth = int(kind[3:]) if kind.startswith("dec") else 0
+    for i in range(len(stack) - 1, -1, -1):
+        node = stack[i]
+        if node.kind == kind:
+            return i                        # same style: sibling
+        if kind == "heading":
+            continue
+        if kind == "article":
+            if node.kind == "heading":
+                return i + 1
+        elif dec_depth:
+            # 1.1 closes the lettered items and bullets of clause 1 but stays inside 1
+            if node.is_heading or (node.kind.startswith("dec") and int(node.kind[3:]) < dec_depth):
+                return i + 1
+        elif kind == "para" or node.is_heading or node.kind.startswith("dec"):
+            return len(stack)               # new list style: child of the current clause
+    return 0 if kind in ("heading", "article") or dec_depth else len(stack)
+
+
+def segment(text: str) -> ClauseTree:
+    """Build the clause tree of `text` in one pass over its lines."""
+    nodes: List[Clause] = []
+    roots: List[Clause] = []
+    stack: List[Clause] = []
+    blank_before = True
+    n = len(text)
+    pos = 0
+
+    def open_node(kind: str, label: str, start: int, body_start: int, is_heading: bool) -> Clause:
+        if nodes:
+            nodes[-1].end = start
+        del stack[_attach_depth(stack, kind):]
+        parent = stack[-1] if stack else None
+        node = Clause(text, kind, label, start, body_start, is_heading, parent)
+        (parent.children if parent is not None else roots).append(node)
+        stack.append(node)
+        nodes.append(node)
+        return node
+
+    while pos < n:
+        eol = text.find("\n", pos)
+        if eol < 0:
+            eol = n
+        line = text[pos:eol].strip()
+
+        if not line:
+            blank_before = True
+            pos = eol + 1
+            continue
+
+        current = nodes[-1] if nodes else None
+        m = _MARKER.match(text, pos, eol)
+        marker = _classify(m, stack) if m and m.end() > pos else None
+
+        if marker is not None:
+            kind, label = marker
+            title = text[m.end():eol].strip()
+            is_heading = kind == "article" or (bool(title) and _is_heading_text(title))
+            open_node(kind, label, pos, m.end(), is_heading)
+        elif _is_heading_text(line) and (blank_before or current is None or current.is_heading):
+            if current is not None and current.is_heading and not blank_before and not current.children:
+                pass    # second line of a heading ("ARTICLE I" / "DEFINITIONS")
+            else:
+                open_node("heading", "", pos, pos, True)
+        elif current is None or current.is_heading or (blank_before and current.kind == "para"):
+            open_node("para", "", pos, pos, False)
+        # else: continuation of the current clause
+
+        blank_before = False
+        pos = eol + 1
+
+    if nodes:
+        nodes[-1].end = n
+    for node in reversed(nodes):
+        node.span_end = max(node.end, node.children[-1].span_end) if node.children else node.end
+    return ClauseTree(text, nodes, roots)
+
+
+def split_into_clauses(text: str, min_len: int = 20, dedupe: bool = True) -> List[str]:
+    """
+    Flat clause list (document order) for callers that only need strings.
+    """
+    if not text or not text.strip():
+        return []
+
+    clauses = [c.text for c in segment(text).clauses(min_len)]
+
+    if not dedupe:
+        return clauses
+    seen = set()
+    unique = []
+    for c in clauses:
+        key = " ".join(c.lower().split())
+        if key not in seen:
+            seen.add(key)
+            unique.append(c)
+    return unique
@@ -0,0 +1,43 @@
+from analysis_cache import AnalysisCache, document_key
+
+
+def test_key_depends_on_bytes_and_config():
+    assert document_key(b"nda", {"version": 1}) == document_key(b"nda", {"version": 1})
+    assert document_key(b"nda", {"version": 1}) != document_key(b"nda", {"version": 2})
+    assert document_key(b"nda") != document_key(b"nda v2")
+    assert document_key(b"x", {"a": 1, "b": 2}) == document_key(b"x", {"b": 2, "a": 1})
+
+
+def test_miss_then_hit():
+    cache = AnalysisCache(max_entries=4)
+    assert cache.get("k") is None
+    cache.put("k", {"fairness": 50})
+    assert cache.get("k") == {"fairness": 50}
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1, "entries": 1}
+
+
+def test_least_recently_used_is_evicted():
+    cache = AnalysisCache(max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    cache.get("a")                       # "b" is now the oldest
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1} and cache.get("c") == {"n": 3}
+
+
+def test_disk_tier_survives_eviction_and_restart(tmp_path):
+    cache = AnalysisCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    assert cache.stats()["disk_hits"] == 1
+    assert AnalysisCache(disk_dir=str(tmp_path)).get("b") == {"n": 2}
+
+
+def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    (tmp_path / "bad.pkl").write_bytes(b"not a pickle")
+    cache = AnalysisCache(disk_dir=str(tmp_path))
+    assert cache.get("bad") is None
+    assert cache.get_or_compute("bad", lambda: {"n": 1}) == {"n": 1}
+    assert AnalysisCache(disk_dir=str(tmp_path)).get("bad") == {"n": 1}
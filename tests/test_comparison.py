@@ -0,0 +1,62 @@
+import random
+
+from comparison import compare_contracts, jaccard, shingles, sketch, word_edits
+
+OLD = """1. Definitions. Confidential Information means technical and business data disclosed in writing.
+2. Term. This Agreement remains in force for two years from the Effective Date.
+3. Governing Law. This Agreement is governed by the laws of the State of Delaware.
+4. Notices. All notices shall be sent by registered mail to the addresses above.
+"""
+
+NEW = """1. Definitions. Confidential Information means technical and business data disclosed in writing.
+2. Term. This Agreement remains in force for 7 years from the Effective Date.
+3. Governing Law. This Agreement is governed by the laws of the State of Delaware.
+4. Liability. The Receiving Party accepts unlimited liability for any breach of this Agreement.
+"""
+
+
+def test_unchanged_modified_added_removed():
+    report = compare_contracts(OLD, NEW)
+    assert report.unchanged == 2
+    assert [(c.old.number, c.new.number) for c in report.modified] == [("2", "2")]
+    assert [c.new.number for c in report.added] == ["4"]
+    assert [c.old.number for c in report.removed] == ["4"]
+    assert report.summary().startswith("1 clauses added, 1 removed, 1 modified, 2 unchanged.")
+
+
+def test_word_edits_and_risks_of_modified_clause():
+    change = compare_contracts(OLD, NEW).modified[0]
+    assert ("replace", "two", "7") in change.edits
+    assert change.risks_added == ["Long duration (>5 years)"]
+    report = compare_contracts(OLD, NEW)
+    assert "Unlimited liability" in report.risks_introduced
+    assert report.risks_resolved == []
+
+
+def test_identical_contracts():
+    report = compare_contracts(OLD, OLD)
+    assert report.unchanged == 4
+    assert not (report.added or report.removed or report.modified)
+
+
+def test_reordered_clauses_are_unchanged():
+    lines = OLD.strip().splitlines()
+    report = compare_contracts(OLD, "\n".join(reversed(lines)))
+    assert report.unchanged == 4 and not report.modified
+
+
+def test_word_edits():
+    assert word_edits("pay within thirty days", "pay within sixty days") == [("replace", "thirty", "sixty")]
+    assert word_edits("a b", "a b") == []
+
+
+def test_sketch_agreement_tracks_jaccard():
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(400)]
+    base = " ".join(rng.choice(words) for _ in range(200))
+    close = base.rsplit(" ", 10)[0]
+    far = " ".join(rng.choice(words) for _ in range(200))
+    a, b, c = shingles(base), shingles(close), shingles(far)
+    assert jaccard(a, b) > 0.9 > 0.1 > jaccard(a, c)
+    agree = lambda x, y: sum(p == q for p, q in zip(sketch(x), sketch(y))) / len(sketch(x))
+    assert agree(a, b) > 0.7 and agree(a, c) < 0.2
@@ -0,0 +1,66 @@
+import re
+
+from doc_classifier import (DOC_TYPES, UNKNOWN_TYPE, ClassifierStats, _trie_pattern, classify_tiered,
+                            score_doc_types)
+
+NDA = ("MUTUAL NON-DISCLOSURE AGREEMENT\n\nThe Disclosing Party may share Confidential Information "
+       "with the Receiving Party, who shall protect it.")
+LEASE = "LEASE AGREEMENT\n\nThe Landlord rents the premises to the Tenant. Rent is due monthly."
+AMBIGUOUS = "This agreement covers the services and the software license granted to the client."
+
+
+def never_called(text):
+    raise AssertionError("LLM called for a clear-cut document")
+
+
+def test_clear_documents_are_answered_by_keywords():
+    stats = ClassifierStats()
+    assert classify_tiered(NDA, llm=never_called, stats=stats).doc_type == "Non-Disclosure Agreement (NDA)"
+    result = classify_tiered(LEASE, llm=never_called, stats=stats)
+    assert (result.doc_type, result.tier) == ("Lease Agreement", "keywords")
+    assert stats.summary()[0]["count"] == 2
+
+
+def test_low_margin_goes_to_llm_and_records_agreement():
+    stats = ClassifierStats()
+    asked = []
+    result = classify_tiered(AMBIGUOUS, llm=lambda t: asked.append(t) or "Service Agreement", stats=stats)
+    assert asked and (result.doc_type, result.tier) == ("Service Agreement", "llm")
+    assert stats.tiers == {"llm": 1}
+
+
+def test_unusable_llm_answer_falls_back_to_model_guess():
+    result = classify_tiered(AMBIGUOUS, llm=lambda t: "A poem", stats=None)
+    assert result.tier == "fallback"
+    assert result.doc_type == score_doc_types(AMBIGUOUS)[0][0]
+
+
+def test_empty_and_unknown():
+    assert classify_tiered("   ", stats=None) == (UNKNOWN_TYPE, "empty", 0.0, 0.0)
+    assert classify_tiered("Lorem ipsum dolor sit amet.", stats=None).doc_type == UNKNOWN_TYPE
+
+
+def test_title_phrases_count_double_and_repeats_are_capped():
+    title = dict(score_doc_types("Landlord"))["Lease Agreement"]
+    body = dict(score_doc_types("x" * 400 + " landlord"))["Lease Agreement"]
+    assert title == 2 * body
+    capped = dict(score_doc_types("x" * 400 + " landlord" * 10))["Lease Agreement"]
+    assert capped == 3 * body
+
+
+def test_phrases_match_whole_words_only():
+    assert dict(score_doc_types("x" * 400 + " agenda items"))["Non-Disclosure Agreement (NDA)"] == 0
+    assert dict(score_doc_types("x" * 400 + " the nda"))["Non-Disclosure Agreement (NDA)"] > 0
+
+
+def test_trie_pattern_matches_same_phrases_as_plain_alternation():
+    phrases = ["lease", "lease agreement", "lessee", "lessor", "le"]
+    factored = re.compile(_trie_pattern(phrases))
+    plain = re.compile("|".join(sorted(map(re.escape, phrases), key=len, reverse=True)))
+    for text in phrases + ["lea", "lessees", "lease agreements", "lx"]:
+        a, b = factored.match(text), plain.match(text)
+        assert (a and a.group(0)) == (b and b.group(0)), text
+
+
+def test_every_type_has_terms():
+    assert all(score_doc_types(t.lower())[0][0] == t for t in DOC_TYPES)
@@ -0,0 +1,62 @@
+from incremental import ClauseResultStore, clause_fingerprint, diff_fingerprints
+
+V1 = ["Term is two years.", "Governing law is Delaware.", "Notices go by email.", "Notices go by email."]
+V2 = ["Term is  two\nyears.", "Governing law is New York.", "Notices go by email.", "A new clause."]
+
+
+def fingerprints(clauses):
+    return [clause_fingerprint(c) for c in clauses]
+
+
+def test_fingerprint_ignores_spacing_only():
+    assert clause_fingerprint("Term is two years.") == clause_fingerprint(" Term is  two\nyears. ")
+    assert clause_fingerprint("Term is two years.") != clause_fingerprint("Term is three years.")
+
+
+def test_diff_counts_changed_clause_as_removal_plus_addition():
+    diff = diff_fingerprints(fingerprints(V1), fingerprints(V2))
+    assert diff.added == [1, 3]
+    assert diff.removed == [1, 3]          # one of the duplicate clauses is gone
+    assert diff.unchanged == 2
+    assert diff.summary() == "2 new/changed, 2 removed, 2 unchanged"
+
+
+def test_revision_only_computes_new_clauses():
+    store = ClauseResultStore(max_entries=64)
+    seen = []
+
+    def compute(batch):
+        seen.append(list(batch))
+        return [len(c) for c in batch]
+
+    first = store.map_counted("len", V1, compute)
+    assert seen == [V1[:3]]                # duplicates computed once
+    assert (first.reused, first.computed) == (0, 3)
+    assert first.results == [len(c) for c in V1]
+
+    second = store.map_counted("len", V2, compute)
+    assert seen[1] == [V2[1], V2[3]]
+    assert (second.reused, second.computed) == (2, 2)
+    assert second.results[0] == len(V1[0])  # stored under the spacing-insensitive fingerprint
+
+
+def test_config_and_stage_separate_results():
+    store = ClauseResultStore()
+    store.put("simplify", "A clause.", "v1 answer", {"model": "a"})
+    assert store.get("simplify", "A clause.", {"model": "a"}) == "v1 answer"
+    assert store.get("simplify", "A clause.", {"model": "b"}) is None
+    assert store.get("risks", "A clause.", {"model": "a"}) is None
+
+
+def test_values_failing_keep_are_not_stored():
+    store = ClauseResultStore()
+    run = store.map_counted("simplify", ["A clause."], lambda batch: [""], keep=bool)
+    assert run.results == [""]
+    assert store.get("simplify", "A clause.") is None
+
+
+def test_disk_tier_shares_results_between_stores(tmp_path):
+    ClauseResultStore(disk_dir=str(tmp_path)).map("len", V1, lambda b: [len(c) for c in b])
+    calls = []
+    results = ClauseResultStore(disk_dir=str(tmp_path)).map("len", V1, lambda b: calls.append(b) or [])
+    assert results == [len(c) for c in V1] and not calls
@@ -0,0 +1,62 @@
+import threading
+
+import inference_worker
+from generation import plan_batches
+from inference_worker import InferenceWorker
+
+
+def test_plan_batches_groups_similar_lengths():
+    lengths = [500, 10, 480, 12, 11, 510]
+    batches = plan_batches(lengths, max_new_tokens=10, max_batch_tokens=10_000, max_batch_size=3)
+    assert batches == [[1, 4, 3], [2, 0, 5]]
+
+
+def test_plan_batches_respects_token_budget():
+    lengths = [100, 100, 100, 100]
+    # (n + 1) * (100 + 100) > 450 closes a batch at two prompts
+    assert plan_batches(lengths, max_new_tokens=100, max_batch_tokens=450) == [[0, 1], [2, 3]]
+
+
+def test_plan_batches_over_budget_prompt_gets_own_batch():
+    assert plan_batches([5000, 10], max_new_tokens=100, max_batch_tokens=1000) == [[1], [0]]
+    assert plan_batches([], max_new_tokens=100) == []
+
+
+def _fake_generate(calls):
+    def generate_batch(model, tokenizer, prompts, max_new_tokens=200, **kwargs):
+        calls.append(list(prompts))
+        return [p.upper() for p in prompts]
+    return generate_batch
+
+
+def test_submit_many_reaches_generate_batch_as_one_list(monkeypatch):
+    calls = []
+    monkeypatch.setattr(inference_worker, "generate_batch", _fake_generate(calls))
+    worker = InferenceWorker(None, None, batch_window_ms=0, max_batch_size=2)
+    prompts = [f"clause {i}" for i in range(7)]
+    futures = worker.submit_many(prompts, max_new_tokens=20, do_sample=False)
+    assert [f.result(timeout=5) for f in futures] == [p.upper() for p in prompts]
+    # Not cut into max_batch_size windows: generate_batch buckets the whole list
+    assert calls == [prompts]
+    worker.close()
+
+
+def test_different_settings_are_not_batched_together(monkeypatch):
+    calls = []
+    monkeypatch.setattr(inference_worker, "generate_batch", _fake_generate(calls))
+    worker = InferenceWorker(None, None, batch_window_ms=200)
+    a = worker.submit("a", max_new_tokens=20)
+    b = worker.submit("b", max_new_tokens=50)
+    c = worker.submit("c", max_new_tokens=20)
+    assert (a.result(timeout=5), b.result(timeout=5), c.result(timeout=5)) == ("A", "B", "C")
+    assert sorted(calls) == [["a", "c"], ["b"]]
+    worker.close()
+
+
+def test_call_runs_on_worker_thread_under_model_lock():
+    worker = InferenceWorker(None, None, batch_window_ms=0)
+    seen = worker.call(lambda: (threading.current_thread().name, worker.model_lock.locked())).result(timeout=5)
+    assert seen == ("inference-worker", True)
+    failed = worker.call(lambda: 1 / 0)
+    assert isinstance(failed.exception(timeout=5), ZeroDivisionError)
+    worker.close()
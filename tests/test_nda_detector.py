@@ -0,0 +1,54 @@
+from nda_detector import NDA_KEYWORDS, NdaDetector, is_nda_text
+
+FILLER = "The parties agree to the terms set out in this document. "
+
+
+def old_is_nda(text):
+    """The check analyze_document replaced."""
+    return not (len(text) < 50 or not any(k.lower() in text.lower() for k in NDA_KEYWORDS))
+
+
+def test_matches_old_check():
+    samples = [
+        "",
+        "NDA",
+        FILLER,
+        FILLER + "The Receiving Party shall protect Confidential Information.",
+        "MUTUAL NON-DISCLOSURE AGREEMENT between two companies, effective today.",
+        FILLER * 3 + "confidentiality",
+    ]
+    for text in samples:
+        assert is_nda_text(text) == old_is_nda(text), text
+
+
+def test_answers_as_soon_as_a_keyword_is_seen():
+    detector = NdaDetector()
+    assert detector.feed_page(FILLER + "This Non-Disclosure Agreement is made today.") is True
+    # Later pages are not scanned once the answer is known
+    assert detector.feed_page("x" * 100000) is True
+    assert detector.scanned_chars < 200
+
+
+def test_rejects_after_the_page_budget():
+    detector = NdaDetector(max_pages=2)
+    assert detector.feed_page(FILLER) is None
+    assert detector.feed_page(FILLER) is False
+    assert detector.feed_page("confidential information") is False
+
+
+def test_keyword_beyond_the_char_budget_is_not_seen():
+    detector = NdaDetector(max_chars=100)
+    assert detector.feed(FILLER * 2) is False
+    assert not is_nda_text(FILLER * 400 + "receiving party")   # past NDA_SCAN_CHARS
+
+
+def test_keyword_split_across_chunks():
+    detector = NdaDetector()
+    assert detector.feed(FILLER + "the receiving") is None
+    assert detector.feed(" party shall comply") is True
+
+
+def test_short_document_waits_for_finish():
+    detector = NdaDetector()
+    assert detector.feed("NDA") is None
+    assert detector.finish() is False
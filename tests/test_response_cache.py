@@ -0,0 +1,51 @@
+from response_cache import ResponseCache, is_deterministic, normalize_prompt, response_key
+
+GREEDY = {"do_sample": False, "max_new_tokens": 200}
+
+
+def test_miss_then_hit(tmp_path):
+    cache = ResponseCache(str(tmp_path / "r.sqlite"))
+    key = response_key("Simplify: clause", "granite", GREEDY)
+    assert cache.get(key) is None
+    cache.put(key, "plain text", "granite")
+    assert cache.get(key) == "plain text"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_survives_reopen(tmp_path):
+    path = str(tmp_path / "r.sqlite")
+    key = response_key("p", "granite", GREEDY)
+    ResponseCache(path).put(key, "kept", "granite")
+    assert ResponseCache(path).get(key) == "kept"
+
+
+def test_key_ignores_whitespace_but_not_model_or_params():
+    assert normalize_prompt("a  b\r\nc \n") == "a b\nc"
+    assert response_key("a  b\r\nc", "m", GREEDY) == response_key("a b\nc", "m", GREEDY)
+    assert response_key("a", "m", GREEDY) != response_key("a", "other", GREEDY)
+    assert response_key("a", "m", GREEDY) != response_key("a", "m", {**GREEDY, "max_new_tokens": 100})
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "r.sqlite"), max_bytes=1600)
+    keys = [response_key(str(i), "m", GREEDY) for i in range(4)]
+    for k in keys[:3]:
+        cache.put(k, "x" * 400)
+    cache.get(keys[0])                    # keys[1] is now the oldest
+    cache.put(keys[3], "x" * 400)
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(k) is not None for k in (keys[0], keys[2], keys[3]))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sampled_calls_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "r.sqlite"))
+    calls = []
+    generate = lambda: calls.append(1) or f"draw {len(calls)}"
+    sampled = {"do_sample": True, "temperature": 0.4}
+    assert not is_deterministic(sampled)
+    assert cache.get_or_generate("p", "m", sampled, generate) == "draw 1"
+    assert cache.get_or_generate("p", "m", sampled, generate) == "draw 2"
+    assert cache.get_or_generate("p", "m", GREEDY, generate) == "draw 3"
+    assert cache.get_or_generate("p", "m", GREEDY, generate) == "draw 3"
+    assert cache.stats()["entries"] == 1
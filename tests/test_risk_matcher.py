@@ -0,0 +1,76 @@
+import glob
+import os
+import re
+
+from risk_matcher import RISK_PATTERNS, RiskMatcher, default_rules, load_kb_rules
+from segmentation import split_into_clauses
+
+ASSETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+
+CLAUSES = [
+    "Only the Receiving Party shall protect All Information disclosed.",
+    "This obligation is perpetual and the Recipient cannot terminate it.",
+    "The Company accepts unlimited liability for all damages.",
+    "The agreement lasts 5 years.",
+    "Nothing risky in this clause at all.",
+]
+
+
+def old_detect_risks(clauses):
+    """The per-clause keyword loop the matcher replaced."""
+    risks_found = []
+    for clause in clauses:
+        lower_c = clause.lower()
+        for risk_label, kws in RISK_PATTERNS.items():
+            if any(k in lower_c for k in kws):
+                risks_found.append(risk_label)
+    return list(dict.fromkeys(risks_found))[:5]
+
+
+def sample_clauses():
+    clauses = list(CLAUSES)
+    for path in sorted(glob.glob(os.path.join(ASSETS, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            clauses += split_into_clauses(f.read())
+    return clauses
+
+
+def test_labels_match_old_keyword_loop():
+    matcher = RiskMatcher(RISK_PATTERNS)
+    clauses = sample_clauses()
+    assert matcher.labels_for_clauses(clauses, limit=5) == old_detect_risks(clauses)
+    for clause in clauses:
+        assert matcher.labels_for_clauses([clause], limit=5) == old_detect_risks([clause])
+
+
+def test_hits_match_regex_search():
+    matcher = RiskMatcher({"Risky": ["penalty", "termination", "sole", "exclusive", "arbitration"]})
+    pattern = re.compile(r"penalty|termination|sole|exclusive|arbitration", re.I)
+    for clause in sample_clauses():
+        assert bool(matcher.scan(clause)) == bool(pattern.search(clause))
+
+
+def test_spans_are_per_clause():
+    hits = RiskMatcher(RISK_PATTERNS).scan_clauses(CLAUSES)
+    for clause, clause_hits in zip(CLAUSES, hits):
+        for h in clause_hits:
+            assert clause[h.start:h.end].lower() == h.keyword
+    assert not hits[-1]
+
+
+def test_chunked_scan_finds_keywords_across_boundaries():
+    matcher = RiskMatcher(RISK_PATTERNS)
+    text = "Neither party cannot terminate this agreement."
+    hits, state = matcher.scan_chunk(text[:20])
+    more, _ = matcher.scan_chunk(text[20:], state, offset=20)
+    assert [h.keyword for h in hits + more] == [h.keyword for h in matcher.scan(text)]
+
+
+def test_kb_keywords_do_not_double_count_builtin_patterns():
+    # A phrase matched by two labels would be penalised twice by compute_fairness
+    builtin = {kw: label for label, kws in RISK_PATTERNS.items() for kw in kws}
+    for label, kws in load_kb_rules().items():
+        for kw in kws:
+            overlaps = [b for b in builtin if b in kw or kw in b]
+            assert not overlaps, (label, kw, overlaps)
+    assert set(RISK_PATTERNS) <= set(default_rules())
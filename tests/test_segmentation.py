@@ -0,0 +1,66 @@
+from segmentation import segment, split_into_clauses
+
+NESTED = """ARTICLE I
+DEFINITIONS
+
+1. Confidential Information means any information disclosed.
+1.1 It includes trade secrets and know-how of the Discloser.
+(a) technical data, drawings and specifications;
+(b) business plans, forecasts and customer lists;
+(i) whether oral or written;
+(ii) whether marked or not;
+(c) any copies or summaries of the above.
+2. Obligations of the Receiving Party are set out below.
+"""
+
+
+def test_nested_numbering():
+    clauses = segment(NESTED).clauses()
+    assert [c.number for c in clauses] == ["1", "1.1", "1.1(a)", "1.1(b)", "1.1(b)(i)", "1.1(b)(ii)", "1.1(c)", "2"]
+    assert [c.level for c in clauses][:5] == [1, 2, 3, 3, 4]
+
+
+def test_headings_are_not_clauses():
+    tree = segment(NESTED)
+    assert [h.text for h in tree.headings()] == ["DEFINITIONS"]
+    assert all(not c.is_heading for c in tree.clauses())
+
+
+def test_offsets_point_into_text():
+    for c in segment(NESTED).clauses():
+        assert NESTED[c.text_start:c.text_start + len(c.text)] == c.text
+
+
+def test_letter_after_h_continues_the_lettered_list():
+    text = ("1. Obligations of the Receiving Party are set out below.\n"
+            "(h) an eighth item that is lettered here;\n"
+            "(i) the next lettered item after h;\n")
+    kinds = [c.kind for c in segment(text).clauses()]
+    assert kinds[-2:] == ["paren_alpha", "paren_alpha"]
+
+
+def test_multi_letter_labels_mixed_with_single_letters():
+    # Regression: "(Note)" on the stack made a later "(c)" / "(i)" crash in ord()
+    text = ("1. The Receiving Party shall keep everything secret.\n"
+            "(Note) This note applies to the whole section.\n"
+            "(c) The third item of the list goes here.\n"
+            "(USA) Applies to United States residents only.\n"
+            "(i) The first sub-item of the list goes here.\n"
+            "(v) The fifth sub-item of the list goes here.\n"
+            "(x) A lettered item near the end goes here.\n")
+    assert len(split_into_clauses(text)) == 7
+
+
+def test_unstructured_text_falls_back_to_sentences():
+    text = ("The party shall keep secrets forever. The recipient may not disclose anything. "
+            "This agreement lasts five years. Governing law is Delaware law.")
+    clauses = segment(text).clauses()
+    assert [c.text for c in clauses] == split_into_clauses(text)
+    assert len(clauses) == 4
+    assert text[clauses[1].text_start:].startswith("The recipient")
+
+
+def test_split_into_clauses_dedupes_and_filters_short():
+    text = "1. Same clause text repeated here.\n2. Same clause text repeated here.\n3. Short.\n"
+    assert split_into_clauses(text) == ["Same clause text repeated here."]
+    assert split_into_clauses("") == []
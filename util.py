@@ -1,6 +1,8 @@
 
 from pypdf import PdfReader
 import re
+from segmentation import split_into_clauses
+from clause_library import get_default_index
 
 def extract_text_from_pdf(file):
     reader = PdfReader(file)
@@ -9,9 +11,6 @@ def extract_text_from_pdf(file):
         text += p.extract_text() + "\n"
     return text
 
-def split_into_clauses(text):
-    return [c.strip() for c in text.split("\n") if len(c.strip()) > 20]
-
 def simplify_clause(text, mode):
     if mode == "ELI5":
         return "This clause means in simple child language: " + text[:150]
@@ -36,5 +35,8 @@ def generate_risks(text):
 def fairness_score(text):
     return (40, 60)
 
-def alternative_clauses(original):
-    return "A more fair version of this clause is recommended here."
+def alternative_clauses(original, k=1):
+    alternatives = get_default_index().search(original, k=k)
+    if not alternatives:
+        return "A more fair version of this clause is recommended here."
+    return "\n\n".join(alt.text for alt in alternatives)
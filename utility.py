@@ -1,8 +1,16 @@
 import streamlit as st
 import os
+import threading
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from multilingual import UI_TEXT, translate_text
-from util import extract_text, split_into_clauses, simplify_clause, chat_with_model
+from app import simplify_clause, stream_chat_with_model
+from analysis_cache import AnalysisCache, document_key
+from incremental import ClauseResultStore, diff_fingerprints
+from generation import ChatSession
+from analysis import ANALYSIS_CONFIG, analyze_document, clause_risk_labels
+from clause_library import get_default_index
+from model_loader import PRELOAD_MODELS, BackgroundLoader
+from diagnostics import render_diagnostics_panel, tag_session
 
 # ---------------------------------------------------
 # ✅ PAGE CONFIG
@@ -11,6 +19,7 @@ st.set_page_config(
     page_title="ClauseWise – NDA Assistant",
     layout="wide"
 )
+tag_session()
 
 st.markdown(
     "<h2 style='text-align:center;'>ClauseWise – Multilingual NDA Legal Assistant</h2>",
@@ -38,7 +47,7 @@ T = {k: v[st.session_state.lang] for k, v in UI_TEXT.items()}
 # ---------------------------------------------------
 # ✅ LOAD CHAT MODEL (DistilGPT2 – HF SAFE)
 # ---------------------------------------------------
-@st.cache_resource
+# Runs on a background thread: no Streamlit calls here
 def load_chat_model():
     model_name = "distilgpt2"
     tokenizer = AutoTokenizer.from_pretrained(model_name)
@@ -50,12 +59,60 @@ def load_chat_model():
     return model, tokenizer
 
 
-model, tokenizer = load_chat_model()
+@st.cache_resource
+def get_chat_model_loader():
+    return BackgroundLoader("DistilGPT2 chat model", load_chat_model)
+
+
+@st.cache_resource
+def get_model_lock():
+    # Chat replies are streamed, so there is nothing to batch: sessions only take turns on the model
+    return threading.Lock()
+
+
+chat_model_loader = get_chat_model_loader()
+st.sidebar.caption(chat_model_loader.describe())
 
 # Chat history
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# KV cache of the conversation so far (reused across chat turns)
+if "chat_session" not in st.session_state:
+    st.session_state.chat_session = ChatSession()
+
+
+# ---------------------------------------------------
+# ✅ DOCUMENT ANALYSIS (cached per document hash)
+# ---------------------------------------------------
+@st.cache_resource
+def get_analysis_cache():
+    return AnalysisCache(
+        max_entries=int(os.environ.get("CLAUSEWISE_CACHE_ENTRIES", "32")),
+        disk_dir=os.environ.get("CLAUSEWISE_CACHE_DIR") or None,
+    )
+
+
+@st.cache_resource
+def get_clause_store():
+    # Per-clause risks/entities: a revised upload only rescans edited clauses
+    cache_dir = os.environ.get("CLAUSEWISE_CACHE_DIR")
+    return ClauseResultStore(
+        max_entries=int(os.environ.get("CLAUSEWISE_CLAUSE_CACHE_ENTRIES", "4096")),
+        disk_dir=os.path.join(cache_dir, "clauses") if cache_dir else None,
+    )
+
+
+@st.cache_resource
+def get_clause_index():
+    # Memory-mapped library index, built on first use and shared by all sessions
+    return get_default_index()
+
+
+analysis_cache = get_analysis_cache()
+clause_store = get_clause_store()
+ALT_MAX_CLAUSES = int(os.environ.get("CLAUSEWISE_ALT_MAX_CLAUSES", "10"))
+
 
 # ---------------------------------------------------
 # ✅ FILE UPLOAD
@@ -63,26 +120,48 @@ if "chat_history" not in st.session_state:
 st.subheader(T["upload_title"])
 uploaded = st.file_uploader(T["upload_instruction"], type=["pdf", "txt", "docx"])
 
+# The upload widget is on screen: warm up the chat model in the background
+if PRELOAD_MODELS:
+    chat_model_loader.start()
+
 if uploaded:
-    st.info("⏳ Reading file...")
-    text = extract_text(uploaded)
+    cache_key = document_key(uploaded.getvalue(), ANALYSIS_CONFIG)
+    analysis = analysis_cache.get(cache_key)
+    if analysis is None:
+        st.info("⏳ Reading file...")
+        analysis = analyze_document(uploaded, clause_store)
+        analysis_cache.put(cache_key, analysis)
+
+    # Compare with the previous upload in this session (e.g. v1 -> v2 of an NDA)
+    if analysis["is_nda"] and st.session_state.get("last_doc_key") != cache_key:
+        previous = st.session_state.get("last_fingerprints")
+        if previous is not None:
+            st.session_state.revision_summary = diff_fingerprints(previous, analysis["fingerprints"]).summary()
+        st.session_state.last_doc_key = cache_key
+        st.session_state.last_fingerprints = analysis["fingerprints"]
+    if st.session_state.get("revision_summary"):
+        st.sidebar.caption(f"Changes since previous upload: {st.session_state.revision_summary}")
+
+    cache_stats = analysis_cache.stats()
+    st.sidebar.caption(
+        f"Analysis cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits / "
+        f"{cache_stats['misses']} misses ({cache_stats['entries']} cached)"
+    )
+
+    text = analysis["text"]
 
     # ---------------------------------------------------
     # ✅ STRICT NDA DETECTION
     # ---------------------------------------------------
-    NDA_KEYWORDS = [
-        "non-disclosure", "non disclosure", "nda",
-        "confidential information", "disclosing party",
-        "receiving party", "confidentiality",
-        "confidential materials", "protected information"
-    ]
-
-    if len(text) < 50 or not any(k.lower() in text.lower() for k in NDA_KEYWORDS):
+    if not analysis["is_nda"]:
         st.error(T["error_not_nda"])
         st.stop()
 
     st.success(T["success_nda"])
 
+    clauses = analysis["clauses"]
+    risks_found = analysis["risks"]
+
     # ---------------------------------------------------
     # ✅ ANALYSIS TABS
     # ---------------------------------------------------
@@ -108,8 +187,6 @@ if uploaded:
             format_func=lambda x: x[1]
         )[0]
 
-        clauses = split_into_clauses(text)
-
         for i, c in enumerate(clauses):
             with st.expander(f"Clause {i+1}"):
                 st.write("**Original:**")
@@ -124,25 +201,6 @@ if uploaded:
     with tabs[1]:
         st.markdown(f"### {T['risk_title']}")
 
-        # Simple risk detector
-        RISK_PATTERNS = {
-            "Broad confidentiality definition": ["broad", "all information", "any information"],
-            "Unlimited liability": ["unlimited", "full liability", "all damages"],
-            "One-sided obligations": ["shall not", "only the receiving party"],
-            "Long duration (>5 years)": ["5 years", "7 years", "perpetual"],
-            "No termination rights": ["cannot terminate", "no termination"]
-        }
-
-        risks_found = []
-
-        for clause in clauses:
-            lower_c = clause.lower()
-            for risk_label, kws in RISK_PATTERNS.items():
-                if any(k in lower_c for k in kws):
-                    risks_found.append(risk_label)
-
-        risks_found = list(dict.fromkeys(risks_found))[:5]  # top 5
-
         if not risks_found:
             st.success("✅ No major risks detected.")
         else:
@@ -155,7 +213,7 @@ if uploaded:
     with tabs[2]:
         st.markdown(f"### {T['fairness_title']}")
 
-        fairness_score = max(20, min(90, 50 - len(risks_found) * 7))
+        fairness_score = analysis["fairness"]
 
         st.write(f"**{T['your_position']}:** {fairness_score}%")
         st.write(f"**{T['company_position']}:** {100 - fairness_score}%")
@@ -168,22 +226,11 @@ if uploaded:
     with tabs[3]:
         st.markdown(f"### {T['entities_title']}")
 
-        parties = []
-        dates = []
-        money = []
-
-        import re
-
-        for clause in clauses:
-            if "party" in clause.lower():
-                parties.append(clause[:80] + "...")
+        entities = analysis["entities"]
 
-            money.extend(re.findall(r"\$[\d,]+", clause))
-            dates.extend(re.findall(r"\b(?:\d{1,2}\/\d{1,2}\/\d{2,4}|20\d{2})\b", clause))
-
-        st.write("**Parties:**", list(set(parties)))
-        st.write("**Dates:**", list(set(dates)))
-        st.write("**Amounts:**", list(set(money)))
+        st.write("**Parties:**", entities["parties"])
+        st.write("**Dates:**", entities["dates"])
+        st.write("**Amounts:**", entities["money"])
 
     # ===================================================
     # ✅ TAB 5 — ALTERNATIVE CLAUSES
@@ -191,14 +238,21 @@ if uploaded:
     with tabs[4]:
         st.markdown(f"### {T['alt_title']}")
 
-        ALTS = [
-            "A mutual confidentiality clause where both parties share equal protection.",
-            "A time-limited confidentiality period of 2–3 years.",
-            "Liability capped at a fixed reasonable amount."
-        ]
+        # Per-clause labels were stored by analyze_document, so this is a cache hit
+        clause_risks = clause_store.map("risks", clauses, clause_risk_labels, ANALYSIS_CONFIG)
+        risky = [(c, labels) for c, labels in zip(clauses, clause_risks) if labels][:ALT_MAX_CLAUSES]
 
-        for alt in ALTS:
-            st.info(alt)
+        if not risky:
+            st.success("✅ No risky clauses that need an alternative.")
+        else:
+            index = get_clause_index()
+            suggestions = index.search_many([c for c, _ in risky], k=3, risks=[labels for _, labels in risky])
+            for (c, labels), alts in zip(risky, suggestions):
+                with st.expander("⚠️ " + ", ".join(labels) + " — " + c[:80]):
+                    st.write("**Original:**")
+                    st.write(c)
+                    for alt in alts:
+                        st.info(f"**{alt.title}** (match {alt.score:.2f})\n\n{alt.text}")
 
     # ===================================================
     # ✅ TAB 6 — LEGAL CHAT ASSISTANT
@@ -208,14 +262,40 @@ if uploaded:
 
         user_input = st.text_input(T["chat_placeholder"])
 
-        if user_input:
-            reply = chat_with_model(model, tokenizer, user_input, st.session_state.chat_history)
+        # text_input keeps its value across reruns; only answer new questions
+        new_question = user_input and user_input != st.session_state.get("last_chat_input")
 
-            st.session_state.chat_history.append(("User", user_input))
-            st.session_state.chat_history.append(("AI", reply))
+        history_to_show = st.session_state.chat_history[-10:]
+        if new_question:
+            history_to_show = st.session_state.chat_history[-8:]
 
-        for role, msg in st.session_state.chat_history[-10:]:
+        for role, msg in history_to_show:
             if role == "User":
                 st.markdown(f"🧑 **You:** {msg}")
             else:
                 st.markdown(f"🤖 **ClauseWise:** {msg}")
+
+        if new_question:
+            st.markdown(f"🧑 **You:** {user_input}")
+            with st.spinner("Loading chat model (first use only)..."):
+                loaded = chat_model_loader.wait()
+            if loaded is None:
+                st.error(chat_model_loader.describe())
+                st.stop()
+            model, tokenizer = loaded
+
+            reply_box = st.empty()
+            reply = ""
+            for chunk in stream_chat_with_model(model, tokenizer, user_input, st.session_state.chat_history,
+                                                st.session_state.chat_session, get_model_lock()):
+                reply += chunk
+                reply_box.markdown(f"🤖 **ClauseWise:** {reply.strip()}▌")
+            reply = reply.strip()
+            reply_box.markdown(f"🤖 **ClauseWise:** {reply}")
+
+            st.session_state.chat_history.append(("User", user_input))
+            st.session_state.chat_history.append(("AI", reply))
+            st.session_state.last_chat_input = user_input
+
+# Hidden unless opened with ?diagnostics=1 (rendered last so it includes this run's stages)
+render_diagnostics_panel()